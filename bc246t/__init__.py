@@ -1,10 +1,19 @@
 #!/usr/bin/env python
 
+import atexit
+import collections
+import contextlib
 import os
 import serial
+import sys
+import threading
+import time
 from .constants import *
 from .errors import *
 from .schema import schema
+from .instrument import CommandEvent, Instrumentation, LatencyHistogram
+from .scheduler import Scheduler, Unscheduled, command_priority, PRIORITY_INTERACTIVE, \
+    PRIORITY_NORMAL, PRIORITY_BULK
 
 SYSTEM_DEFAULTS = {
     'quick_key': None,
@@ -31,6 +40,42 @@ CHANNEL_DEFAULTS = {
     'alert': False,
 }
 
+# Default number of commands Interface.pipeline() keeps in flight.
+PIPELINE_WINDOW = 8
+
+# Seconds to wait for a reply, unless the command is listed in
+# COMMAND_TIMEOUTS.
+DEFAULT_TIMEOUT = 2.0
+COMMAND_TIMEOUTS = {
+    "CLR": 30.0,
+    "CPS": 10.0,
+    "DSY": 10.0,
+    "DGR": 5.0,
+}
+
+# How often a blocked read wakes up to check its deadline.
+READ_POLL_INTERVAL = 0.1
+
+# After losing sync, how long the line has to stay quiet before anything new
+# is written.
+RESYNC_QUIET = 0.25
+
+# A reply longer than this without a CR means we lost sync.
+MAX_FRAME_LENGTH = 1024
+
+# Commands that only read, and so are safe to send again after a timeout or a
+# garbled reply.  QUERY_COMMANDS take no arguments when reading;
+# INDEXED_QUERY_COMMANDS take the record index.  With more arguments than
+# that, they are writes.
+QUERY_COMMANDS = ("MDL", "VER", "STS", "GID", "BLT", "BSV", "KBP", "OMS", "PRI", "SCT",
+    "SIH", "SIT", "QSL", "QGL", "RMB", "MEM", "WIN", "BAV", "GLF", "CLC", "CSG", "SCO",
+    "WPR", "MCP")
+INDEXED_QUERY_COMMANDS = ("SIN", "GIN", "CIN", "TIN", "TFQ", "REV", "FWD", "GLI", "SGB",
+    "CSP")
+
+# Errors that mean the reply was lost or garbled, rather than refused.
+RETRYABLE_ERRORS = (UnidenTimeoutError, UnidenFramingError, UnidenOverrunError)
+
 def _decode_icon(v):
     if v == "0": return ICON_OFF
     if v == "1": return ICON_ON
@@ -38,51 +83,423 @@ def _decode_icon(v):
 
     raise UnidenUnexpectedResponseError
 
+def _encode_command(cmd, args):
+    prepared = [cmd]
+
+    for v in args:
+        if v.__class__ is bool:
+            v = v and 1 or 0
+        prepared.append(str(v))
+
+    return ','.join(prepared)
+
+def _pop_frame(buf, end):
+    """
+    Remove the frame ending with the CR at buf[end] from buf and return it
+    as text, without the CR.  Raises UnidenFramingError if it isn't text.
+    """
+    try:
+        return buf[:end].decode()
+    except UnicodeDecodeError:
+        raise UnidenFramingError
+    finally:
+        del buf[:end + 1]
+
+def _decode_response(buf):
+    res = buf.split(",")
+
+    if len(res) == 1 and res[0] == "ERR" or len(res) == 2 and res[1] == "ERR":
+        raise UnidenValueError
+
+    if len(res) == 1 and res[0] == "NG" or len(res) == 2 and res[1] == "NG":
+        raise UnidenSyncError
+
+    return res
+
+def _is_idempotent(cmd, args):
+    if cmd in QUERY_COMMANDS:
+        return len(args) == 0
+
+    if cmd in INDEXED_QUERY_COMMANDS:
+        return len(args) <= 1
+
+    return False
+
+def _decode_system_info(res):
+    cmd, sys_type, name, quick_key, hld, lout, att, dly, skp, emg, rev_index, \
+        fwd_index, chn_grp_head, chn_grp_tail, seq_no = res
+
+    if cmd != "SIN":
+        raise UnidenUnexpectedResponseError
+
+    return {
+        "system_type": sys_type,
+        "name": name,
+        "quick_key": quick_key != '.' and int(quick_key) or None,
+        "hold_time": int(hld),
+        "lockout": lout == "1",
+        "attenuation": att == "1",
+        "delay_time": int(dly),
+        "data_skip": skp == "1",
+        "emergency_alert": emg == "1",
+        "reverse_index": rev_index != "-1" and int(rev_index) or None,
+        "forward_index": fwd_index != "-1" and int(fwd_index) or None,
+        "group_head_index": int(chn_grp_head),
+        "group_tail_index": int(chn_grp_tail),
+        "sequence_number": int(seq_no)
+    }
+
+def _decode_group_info(res):
+    cmd, grp_type, name, quick_key, lout, rev_index, fwd_index, sys_index, chn_head, \
+        chn_tail, seq_no = res
+
+    if cmd != "GIN":
+        raise UnidenUnexpectedResponseError
+
+    return {
+        "group_type": grp_type,
+        "group_name": name,
+        "quick_key": quick_key != '.' and int(quick_key) or None,
+        "lockout": lout == "1",
+        "reverse_index": rev_index != "-1" and int(rev_index) or None,
+        "forward_index": fwd_index != "-1" and int(fwd_index) or None,
+        "system_index": int(sys_index),
+        "channel_head_index": int(chn_head),
+        "channel_tail_index": int(chn_tail),
+        "group_sequence": int(seq_no)
+    }
+
+def _decode_channel_info(res):
+    cmd, name, frq, stp, mod, ctcss_dcs, tlock, lout, pri, att, alt, rev_index, fwd_index, sys_index, grp_index = res
+
+    if cmd != "CIN":
+        raise UnidenUnexpectedResponseError
+
+    return {
+        "name": name,
+        "frequency": int(frq),
+        "search_step": int(stp), # FIXME
+        "modulation": mod,
+        "ctcss_dcs_mode": int(ctcss_dcs),
+        "ctcss_dcs_tone_lockout": tlock == "1",
+        "lockout": lout == "1",
+        "priority": int(pri),
+        "attenuation": att == "1",
+        "alert": alt == "1",
+        "reverse_index": rev_index != "-1" and int(rev_index) or None,
+        "forward_index": fwd_index != "-1" and int(fwd_index) or None,
+        "system_index": int(sys_index),
+        "group_index": int(grp_index)
+    }
+
 
 class Interface:
-    def __init__(self, port="/dev/ttyS0", baudrate=57600):
-        self.device = serial.Serial(port=port, baudrate=baudrate)
+    def __init__(self, port="/dev/ttyS0", baudrate=57600, device=None, scheduler=None,
+            timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.1):
+        """
+        Open the scanner on the given serial port (or use an already open
+        device).
+
+        A reply that takes longer than timeout seconds (or the command's entry
+        in COMMAND_TIMEOUTS) raises UnidenTimeoutError.  Read-only commands
+        that time out or get a garbled reply are retried up to retries more
+        times, waiting backoff seconds before the first retry and twice as long
+        before each one after that.
+        """
+        if device is None:
+            device = serial.Serial(port=port, baudrate=baudrate, timeout=READ_POLL_INTERVAL)
+
+        self.device = device
         self.debug = 'DEBUG' in os.environ
+        self.scheduler = scheduler
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hooks = []
+        self._rxbuf = bytearray()
+        self._stale = False
+        self._outstanding = 0
+        self._local = threading.local()
 
-    def __send(self, buf):
-        self.device.write(("%s\r" % buf).encode())
+    @contextlib.contextmanager
+    def priority(self, priority, deadline=None):
+        """
+        Run the enclosed commands, from this thread, at the given priority
+        class (PRIORITY_INTERACTIVE, PRIORITY_NORMAL or PRIORITY_BULK) instead
+        of each command's default.  deadline is how many seconds each command
+        may wait for its turn before it is promoted.
 
-        if self.debug:
-            print("SEND -> %s" % buf)
+        Only matters when the Interface was given a Scheduler, e.g.:
+
+            i = Interface(scheduler=Scheduler())
+
+            with i.priority(PRIORITY_BULK):
+                ...
+        """
+        saved = getattr(self._local, "priority", None)
+        self._local.priority = (priority, deadline)
+
+        try:
+            yield
+        finally:
+            self._local.priority = saved
+
+    def __turn(self, priority):
+        if self.scheduler is None:
+            return Unscheduled()
+
+        override = getattr(self._local, "priority", None)
+
+        if override is not None:
+            return self.scheduler.turn(*override)
+
+        return self.scheduler.turn(priority)
+
+    def __readline(self, timeout=None):
+        """
+        Read one CR-terminated frame from the device and return it decoded,
+        without the CR.
+
+        Rather than reading a byte at a time, this pulls everything the device
+        has waiting in one go.  Whatever follows the CR stays in the buffer and
+        is used for the next frame.
+        """
+        buf = self._rxbuf
+        start = 0
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        while True:
+            end = buf.find(b"\r", start)
+
+            if end != -1:
+                break
 
-        buf = ""
+            if len(buf) > MAX_FRAME_LENGTH:
+                self._stale = True
+                raise UnidenOverrunError
 
-        while len(buf) == 0 or buf[-1] != "\r":
-            recv = self.device.read(1).decode()
+            start = len(buf)
+            recv = self.device.read(self.device.in_waiting or 1)
 
-            if len(recv) == 0:
-                raise Exception("timeout!")
+            if len(recv) == 0 and time.monotonic() >= deadline:
+                self._stale = True
+                raise UnidenTimeoutError
 
             buf += recv
 
-        buf = buf.rstrip("\r")
-        res = buf.split(",")
+        self._outstanding = max(0, self._outstanding - 1)
+
+        try:
+            return _pop_frame(buf, end)
+        except UnidenFramingError:
+            self._stale = True
+            raise
+
+    def __resync(self):
+        """
+        Throw away anything left over from replies we gave up on, so they
+        can't be taken for the replies to the next commands.
+
+        Late replies are read and dropped until there has been one for every
+        command whose reply was never read (waiting up to the timeout for
+        each), and then until the line has been quiet for RESYNC_QUIET
+        seconds.
+        """
+        missing = self._outstanding - self._rxbuf.count(b"\r")
+        del self._rxbuf[:]
+
+        last = time.monotonic()
 
-        if len(res) == 1 and res[0] == "ERR" or len(res) == 2 and res[1] == "ERR":
-            raise UnidenValueError
+        while True:
+            recv = self.device.read(self.device.in_waiting or 1)
+            now = time.monotonic()
 
-        if len(res) == 1 and res[0] == "NG" or len(res) == 2 and res[1] == "NG":
-            raise UnidenSyncError
+            if len(recv) > 0:
+                missing -= recv.count(b"\r")
+                last = now
+            elif now - last >= (missing > 0 and self.timeout or RESYNC_QUIET):
+                break
+
+        self._outstanding = 0
+        self._stale = False
+
+    def __write(self, buf):
+        if self._stale:
+            self.__resync()
+
+        self.device.write(("%s\r" % buf).encode())
+        self._outstanding += 1
+
+        if self.debug:
+            print("SEND -> %s" % buf)
+
+    def __decode(self, line):
+        res = _decode_response(line)
 
         if self.debug:
             print("RECV -> %s" % repr(res))
 
         return res
 
+    def _transact(self, buf):
+        """
+        Send one encoded command and return its raw reply line, undecoded.
+        """
+        cmd = buf.split(",", 1)[0]
+
+        with self.__turn(command_priority(cmd)):
+            self.__write(buf)
+
+            return self.__readline(COMMAND_TIMEOUTS.get(cmd))
+
+    def add_hook(self, fn):
+        """
+        Call fn with a CommandEvent after every command (and every retry of
+        one).  See Instrumentation for a ready-made hook.
+
+        Hooks run on the thread that sent the command, so keep them quick.
+        """
+        self.hooks.append(fn)
+
+    def remove_hook(self, fn):
+        self.hooks.remove(fn)
+
+    def __emit(self, buf, line, start, attempt, error):
+        event = CommandEvent(buf, line, time.perf_counter() - start, attempt, error)
+
+        for fn in self.hooks:
+            fn(event)
+
     def _send(self, cmd, *args):
-        prepared = [cmd]
+        buf = _encode_command(cmd, args)
+        attempts = _is_idempotent(cmd, args) and self.retries + 1 or 1
+        delay = self.backoff
+
+        for attempt in range(attempts):
+            start = self.hooks and time.perf_counter()
+            line = None
+
+            try:
+                line = self._transact(buf)
+                res = self.__decode(line)
+
+                if res[0] != cmd:
+                    self._stale = True
+                    raise UnidenFramingError
+
+                if self.hooks:
+                    self.__emit(buf, line, start, attempt, None)
+
+                return res
+            except UnidenError as e:
+                if self.hooks:
+                    self.__emit(buf, line, start, attempt, e)
+
+                if attempt == attempts - 1 or not isinstance(e, RETRYABLE_ERRORS):
+                    raise
+
+                if self.debug:
+                    print("RETRY -> %s" % buf)
+
+                time.sleep(delay)
+                delay *= 2
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        """
+        Send several commands without waiting for each reply in turn.
+
+        commands is an iterable of tuples, each holding a command name followed
+        by its arguments, e.g.:
+
+            i.pipeline([("CIN", 12), ("CIN", 13), ("GIN", 4)])
+
+        Up to window commands are written back to back before the first reply
+        is read; after that, a new command goes out each time a reply comes in.
+
+        Returns a list with one slot per command, in order.  A slot holds the
+        split reply (as _send() would return it) or, if that command failed,
+        the UnidenError instance describing why--one bad command does not
+        abort the others.  The exception is a reply that is lost or garbled
+        (a timeout, framing or overrun error): the replies after it can't be
+        told apart from it, so every later slot holds UnidenAbortedError
+        instead, and the commands not yet written aren't sent.
+
+        With a Scheduler, the whole pipeline runs as PRIORITY_BULK (unless
+        overridden with priority()) and drains and steps aside whenever a more
+        urgent command is waiting.
+        """
+        if window < 1:
+            raise ValueError
+
+        commands = list(commands)
+        pending = collections.deque()
+        results = []
+        lost = False
+
+        def receive():
+            results.append(self.__receive_slot(*pending.popleft()))
+            return isinstance(results[-1], RETRYABLE_ERRORS)
+
+        with self.__turn(PRIORITY_BULK) as turn:
+            for command in commands:
+                if len(pending) == window:
+                    lost = receive()
+
+                if not lost and turn.contended():
+                    while pending and not lost:
+                        lost = receive()
+
+                    if not lost:
+                        turn.yield_()
+
+                if lost:
+                    break
+
+                buf = _encode_command(command[0], command[1:])
+                start = self.hooks and time.perf_counter()
+
+                self.__write(buf)
+                pending.append((command[0], buf, start))
+
+            while pending and not lost:
+                lost = receive()
+
+        while len(results) < len(commands):
+            results.append(UnidenAbortedError())
+
+        return results
+
+    def __receive_slot(self, cmd, buf, start):
+        line = None
+
+        try:
+            line = self.__readline()
+            res = self.__decode(line)
+
+            if res[0] != cmd:
+                self._stale = True
+                res = UnidenFramingError()
+        except UnidenError as e:
+            res = e
+
+        if self.hooks:
+            self.__emit(buf, line, start, 0, isinstance(res, UnidenError) and res or None)
+
+        return res
+
+    def __pipeline_decode(self, cmd, indices, decode, window):
+        results = self.pipeline([(cmd, idx) for idx in indices], window)
+
+        for n, res in enumerate(results):
+            if isinstance(res, UnidenError):
+                continue
 
-        for v in args:
-            if v.__class__ is bool:
-                v = v and 1 or 0
-            prepared.append(str(v))
+            try:
+                results[n] = decode(res)
+            except (UnidenError, ValueError):
+                results[n] = UnidenUnexpectedResponseError()
 
-        return self.__send(','.join(prepared))
+        return results
 
     ########################################################################
     ##  Remote Control
@@ -916,7 +1333,7 @@ class Interface:
         cmd, idx = self._send("CSY", system_type)
 
         if cmd != "CSY":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         if idx == "-1":
             raise UnidenOutOfResourcesError
@@ -932,7 +1349,7 @@ class Interface:
         cmd, ok = self._send("DSY", idx)
 
         if cmd != "DSY":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         return ok == "OK"
 
@@ -947,12 +1364,15 @@ class Interface:
 
         This command is only acceptable in Programming Mode.
         """
-        cmd, new_idx = self.__self("CPS", idx, name)
+        cmd, new_idx = self._send("CPS", idx, name)
 
         if cmd != "CPS":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
+
+        if new_idx == "-1":
+            raise UnidenOutOfResourcesError
 
-        return new_idx
+        return int(new_idx)
 
     def get_system_info(self, idx):
         """
@@ -978,28 +1398,19 @@ class Interface:
 
         This command is only acceptable in Programming Mode.
         """
-        cmd, sys_type, name, quick_key, hld, lout, att, dly, skp, emg, rev_index, \
-            fwd_index, chn_grp_head, chn_grp_tail, seq_no = self._send("SIN", idx)
+        return _decode_system_info(self._send("SIN", idx))
 
-        if cmd != "SIN":
-            raise UnidenUnexpectedResultError
+    def get_system_infos(self, indices, window=PIPELINE_WINDOW):
+        """
+        Pipelined get_system_info() for several systems at once.
 
-        return {
-            "system_type": sys_type,
-            "name": name,
-            "quick_key": quick_key != '.' and int(quick_key) or None,
-            "hold_time": int(hld),
-            "lockout": lout == "1",
-            "attenuation": att == "1",
-            "delay_time": int(dly),
-            "data_skip": skp == "1",
-            "emergency_alert": emg == "1",
-            "reverse_index": rev_index != "-1" and int(rev_index) or None,
-            "forward_index": fwd_index != "-1" and int(fwd_index) or None,
-            "group_head_index": int(chn_grp_head),
-            "group_tail_index": int(chn_grp_tail),
-            "sequence_number": int(seq_no)
-        }
+        Returns a list in the same order as indices; each item is either the
+        dict get_system_info() would return or the UnidenError for that index.
+        See pipeline().
+
+        This command is only acceptable in Programming Mode.
+        """
+        return self.__pipeline_decode("SIN", indices, _decode_system_info, window)
 
     def set_system_info(self, index, name, v={}):
         for k in SYSTEM_DEFAULTS.keys():
@@ -1014,7 +1425,7 @@ class Interface:
             v['emergency_alert'])
 
         if cmd != "SIN":
-            raise UndenUnexpectedResponseError
+            raise UnidenUnexpectedResponseError
 
         return ok == "OK"
 
@@ -1047,7 +1458,7 @@ class Interface:
         cmd, frq, lcn, rev_index, fwd_index, sys_index, grp_index = self._send("TFQ")
 
         if cmd != "TFQ":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         return {
             "frequency": frq,
@@ -1067,7 +1478,7 @@ class Interface:
         cmd, ok = self._send("TFQ", channel_index, frequency, lcn)
 
         if cmd != "TFQ":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         return ok == "OK"
 
@@ -1080,7 +1491,7 @@ class Interface:
         cmd, group_index = self._send("AGC", system_index)
 
         if cmd != "AGC":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         if group_index == "-1":
             raise UnidenOutOfResourcesError
@@ -1096,7 +1507,7 @@ class Interface:
         cmd, group_index = self._send("AGI", system_index)
 
         if cmd != "AGI":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         if group_index == "-1":
             raise UnidenOutOfResourcesError
@@ -1109,7 +1520,7 @@ class Interface:
 
         This command is only acceptable in Programming Mode.
         """
-        cmd, ok = self._send("DGR", idx)
+        cmd, ok = self._send("DGR", group_index)
 
         if cmd != "DGR":
             raise UnidenUnexpectedResponseError
@@ -1135,24 +1546,19 @@ class Interface:
 
         This command is only acceptable in Programming Mode.
         """
-        cmd, grp_type, name, quick_key, lout, rev_index, fwd_index, sys_index, chn_head, \
-            chn_tail, seq_no = self._send("GIN", group_index)
+        return _decode_group_info(self._send("GIN", group_index))
 
-        if cmd != "GIN":
-            raise UnidenUnexpectedResultError
+    def get_group_infos(self, group_indices, window=PIPELINE_WINDOW):
+        """
+        Pipelined get_group_info() for several groups at once.
 
-        return {
-            "group_type": grp_type,
-            "group_name": name,
-            "quick_key": quick_key != '.' and int(quick_key) or None,
-            "lockout": lout == "1",
-            "reverse_index": rev_index != "-1" and int(rev_index) or None,
-            "forward_index": fwd_index != "-1" and int(fwd_index) or None,
-            "system_index": int(sys_index),
-            "channel_head_index": int(chn_head),
-            "channel_tail_index": int(chn_tail),
-            "group_sequence": int(seq_no)
-        }
+        Returns a list in the same order as group_indices; each item is either
+        the dict get_group_info() would return or the UnidenError for that
+        index.  See pipeline().
+
+        This command is only acceptable in Programming Mode.
+        """
+        return self.__pipeline_decode("GIN", group_indices, _decode_group_info, window)
 
     def set_group_info(self, index, name, v={}):
         for k in GROUP_DEFAULTS.keys():
@@ -1194,28 +1600,17 @@ class Interface:
         return ok == "OK"
 
     def get_channel_info(self, index):
-        cmd, name, frq, stp, mod, ctcss_dcs, tlock, lout, pri, att, alt, rev_index, fwd_index, sys_index, grp_index = \
-            self._send("CIN", index)
+        return _decode_channel_info(self._send("CIN", index))
 
-        if cmd != "CIN":
-            raise UnidenUnexpectedResponseError
+    def get_channel_infos(self, indices, window=PIPELINE_WINDOW):
+        """
+        Pipelined get_channel_info() for several channels at once.
 
-        return {
-            "name": name,
-            "frequency": int(frq),
-            "search_step": int(stp), # FIXME
-            "modulation": mod,
-            "ctcss_dcs_mode": int(ctcss_dcs),
-            "ctcss_dcs_tone_lockout": tlock == "1",
-            "lockout": lout == "1",
-            "priority": int(pri),
-            "attenuation": att == "1",
-            "alert": alt == "1",
-            "reverse_index": rev_index != "-1" and int(rev_index) or None,
-            "forward_index": fwd_index != "-1" and int(fwd_index) or None,
-            "system_index": int(sys_index),
-            "group_index": int(grp_index)
-        }
+        Returns a list in the same order as indices; each item is either the
+        dict get_channel_info() would return or the UnidenError for that index.
+        See pipeline().
+        """
+        return self.__pipeline_decode("CIN", indices, _decode_channel_info, window)
 
     def set_channel_info(self, index, name, frequency, modulation, v={}):
         for k in CHANNEL_DEFAULTS.keys():
@@ -1354,7 +1749,7 @@ class Interface:
         cmd, frequency = self._send("GLF")
 
         if cmd != "GLF":
-            raise UnidenUnexpectedResultError
+            raise UnidenUnexpectedResponseError
 
         return frequency == "-1" and False or frequency
 
@@ -1559,5 +1954,40 @@ class Interface:
 
         return int(value)
 
+from .aio import AsyncInterface
+from .threaded import ThreadedInterface
+from .daemon import ClientInterface, DEFAULT_SOCKET
+from .mirror import MirroredInterface
+
+def connect(port=None, path=DEFAULT_SOCKET):
+    """
+    Open the scanner the way the bundled scripts do.
+
+    If a bc246t daemon is listening on path, a ClientInterface talking to it is
+    returned so the port can be shared with other programs.  Otherwise the
+    port (BC246T_PORT from the environment, or /dev/ttyS0) is opened directly.
+
+    With BC246T_STATS set in the environment, the recent frames are written to
+    stderr whenever a command fails, and a table of time spent per command is
+    written there on exit.
+    """
+    i = None
+
+    if os.path.exists(path):
+        try:
+            i = ClientInterface(path)
+        except OSError:
+            pass
+
+    if i is None:
+        i = Interface(port or os.environ.get('BC246T_PORT', '/dev/ttyS0'))
+
+    if 'BC246T_STATS' in os.environ:
+        stats = Instrumentation(dump_on_error=sys.stderr)
+        i.add_hook(stats)
+        atexit.register(stats.report)
+
+    return i
+
 if __name__ == "__main__":
     print("compiled to bytecode!")
@@ -0,0 +1,250 @@
+import asyncio
+import collections
+import functools
+import os
+import serial
+
+from . import Interface, COMMAND_TIMEOUTS, DEFAULT_TIMEOUT, MAX_FRAME_LENGTH, PIPELINE_WINDOW, RETRYABLE_ERRORS, \
+    _encode_command, _decode_response, _pop_frame
+from .errors import *
+
+# The methods of Interface that AsyncInterface has as coroutines: those that
+# talk to the scanner.  pipeline() has a native version; the hooks and
+# priority(), which are about Interface's own I/O and scheduling, aren't
+# available.
+MIRRORED_METHODS = (
+    "get_current_talkgroup_id_status", "push_key", "power_off", "quick_search_hold",
+    "get_status", "get_model", "get_firmware_version", "enter_program_mode",
+    "exit_program_mode", "get_backlight", "set_backlight", "get_battery_savings_mode",
+    "set_battery_savings_mode", "clear_all_memory", "get_key_beep", "set_key_beep",
+    "get_greeting", "set_greeting", "get_priority_mode", "set_priority_mode",
+    "get_system_count", "get_system_index_head", "get_system_index_tail",
+    "get_system_quick_lockout", "set_system_quick_lockout", "quick_lock_system",
+    "quick_unlock_system", "get_group_quick_lockout", "set_group_quick_lockout",
+    "quick_lock_group", "quick_unlock_group", "create_system", "delete_system",
+    "copy_system", "get_system_info", "get_system_infos", "set_system_info",
+    "get_trunk_info", "set_trunk_info", "get_trunk_frequency_info",
+    "set_trunk_frequency_info", "append_channel_group", "append_talkgroup_id_group",
+    "delete_group", "get_group_info", "get_group_infos", "set_group_info",
+    "append_channel", "append_talkgroup_id", "delete_channel", "get_channel_info",
+    "get_channel_infos", "set_channel_info", "get_talkgroupid_info",
+    "set_talkgroupid_info", "get_lockout_talkgroupid", "unlock_talkgroupid",
+    "lock_talkgroup_id", "get_reverse_index", "get_forward_index", "get_free_memory",
+    "get_used_memory", "get_search_settings", "get_close_call_settings",
+    "set_search_settings", "set_close_call_settings", "get_global_lockout_frequency",
+    "unlock_global_lockout", "lockout_frequency", "get_custom_search_group",
+    "set_custom_search_group", "get_custom_search_settings", "set_custom_search_settings",
+    "get_weather_priority_setting", "set_weather_priority_setting",
+    "get_same_group_settings", "set_same_group_settings",
+    "get_motorola_custom_band_plan_settings", "set_motorola_custom_band_plan_settings",
+    "get_window_voltage", "get_battery_voltage")
+
+
+class _Deferred(Exception):
+    def __init__(self, name, args):
+        Exception.__init__(self, name)
+        self.name = name
+        self.args_ = args
+
+
+class _Replay(Interface):
+    """
+    An Interface with no device behind it.
+
+    Running one of Interface's methods on a _Replay answers its first few
+    commands from a list of replies that have already been received.  The
+    first command that hasn't been answered yet raises _Deferred, telling
+    AsyncInterface what to actually send before trying again.
+    """
+    def __init__(self, replies):
+        self.debug = False
+        self.replies = replies
+        self.n = 0
+
+    def __next(self, name, args):
+        if self.n == len(self.replies):
+            raise _Deferred(name, args)
+
+        self.n += 1
+        return self.replies[self.n - 1]
+
+    def _send(self, cmd, *args):
+        return self.__next("_send", (cmd,) + args)
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        return self.__next("pipeline", (list(commands), window))
+
+
+def _mirror(method):
+    @functools.wraps(method)
+    async def call(self, *args, **kwargs):
+        replies = []
+
+        while True:
+            try:
+                return method(_Replay(replies), *args, **kwargs)
+            except _Deferred as d:
+                replies.append(await getattr(self, d.name)(*d.args_))
+
+    return call
+
+
+class AsyncInterface:
+    """
+    asyncio version of Interface.
+
+    Every method of Interface in MIRRORED_METHODS is available here as a
+    coroutine taking the same arguments and returning the same values, e.g.:
+
+        i = AsyncInterface("/dev/ttyUSB0")
+        status = await i.get_status()
+
+    The port is opened non-blocking and read from the event loop, so one loop
+    can drive any number of scanners.  Commands on one AsyncInterface are sent
+    one at a time, in the order they were awaited.
+
+    Replies are framed and checked the way Interface does it: waiting longer
+    than timeout seconds (or COMMAND_TIMEOUTS) for one raises
+    UnidenTimeoutError, a frame that isn't text or a reply to some other
+    command raises UnidenFramingError and one longer than MAX_FRAME_LENGTH
+    raises UnidenOverrunError.  Any of those, or being cancelled while waiting for a reply, leaves the port to
+    be flushed before the next command goes out, so a late reply can't be
+    mistaken for the next one.  Unlike Interface, nothing is retried.
+    """
+    def __init__(self, port="/dev/ttyS0", baudrate=57600, device=None, timeout=DEFAULT_TIMEOUT):
+        if device is None:
+            device = serial.Serial(port=port, baudrate=baudrate, timeout=0)
+
+        self.device = device
+        self.timeout = timeout
+        self.debug = 'DEBUG' in os.environ
+        self._rxbuf = bytearray()
+        self._lock = asyncio.Lock()
+        self._stale = False
+
+    def close(self):
+        self.device.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    async def __wait_readable(self):
+        loop = asyncio.get_running_loop()
+        fd = self.device.fileno()
+        ready = loop.create_future()
+
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+
+    async def __readline(self):
+        buf = self._rxbuf
+        start = 0
+
+        while True:
+            end = buf.find(b"\r", start)
+
+            if end != -1:
+                break
+
+            if len(buf) > MAX_FRAME_LENGTH:
+                raise UnidenOverrunError
+
+            start = len(buf)
+            recv = self.device.read(self.device.in_waiting)
+
+            if len(recv) == 0:
+                await self.__wait_readable()
+
+            buf += recv
+
+        return _pop_frame(buf, end)
+
+    def __write(self, buf):
+        if self._stale:
+            self.device.reset_input_buffer()
+            del self._rxbuf[:]
+            self._stale = False
+
+        self.device.write(("%s\r" % buf).encode())
+
+        if self.debug:
+            print("SEND -> %s" % buf)
+
+    async def __receive(self, cmd):
+        try:
+            line = await asyncio.wait_for(self.__readline(),
+                COMMAND_TIMEOUTS.get(cmd) or self.timeout)
+        except asyncio.TimeoutError:
+            self._stale = True
+            raise UnidenTimeoutError
+        except (UnidenError, asyncio.CancelledError):
+            self._stale = True
+            raise
+
+        res = _decode_response(line)
+
+        if self.debug:
+            print("RECV -> %s" % repr(res))
+
+        if res[0] != cmd:
+            self._stale = True
+            raise UnidenFramingError
+
+        return res
+
+    async def __receive_slot(self, cmd):
+        try:
+            return await self.__receive(cmd)
+        except UnidenError as e:
+            return e
+
+    async def _send(self, cmd, *args):
+        async with self._lock:
+            self.__write(_encode_command(cmd, args))
+
+            return await self.__receive(cmd)
+
+    async def pipeline(self, commands, window=PIPELINE_WINDOW):
+        """
+        Coroutine version of Interface.pipeline().  As there, once a slot
+        fails with one of RETRYABLE_ERRORS the rest are UnidenAbortedError.
+        """
+        if window < 1:
+            raise ValueError
+
+        commands = list(commands)
+
+        async with self._lock:
+            pending = collections.deque()
+            results = []
+            lost = False
+
+            for command in commands:
+                if len(pending) == window:
+                    results.append(await self.__receive_slot(pending.popleft()))
+                    lost = isinstance(results[-1], RETRYABLE_ERRORS)
+
+                if lost:
+                    break
+
+                self.__write(_encode_command(command[0], command[1:]))
+                pending.append(command[0])
+
+            while pending and not lost:
+                results.append(await self.__receive_slot(pending.popleft()))
+                lost = isinstance(results[-1], RETRYABLE_ERRORS)
+
+        while len(results) < len(commands):
+            results.append(UnidenAbortedError())
+
+        return results
+
+
+for _name in MIRRORED_METHODS:
+    setattr(AsyncInterface, _name, _mirror(getattr(Interface, _name)))
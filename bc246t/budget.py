@@ -0,0 +1,164 @@
+import json
+import math
+import os
+
+from . import SYSTEM_TYPE_CONVENTIONAL, UnidenError, UnidenOutOfResourcesError
+from .snapshot import SNAPSHOT_DIR
+
+MODEL_PATH = os.path.join(SNAPSHOT_DIR, 'memory.json')
+
+# How many channels the calibration probe appends, to average out rounding.
+PROBE_CHANNELS = 4
+
+
+def _key(i, model, firmware):
+    port = getattr(i.device, 'port', None) or 'scanner'
+
+    return '%s %s %s' % (model, firmware, port)
+
+
+def load(i, model, firmware, path=MODEL_PATH):
+    """
+    Returns the memory model stored for the scanner of that model and
+    firmware on i's port, or None.
+    A model is a dict with the cost in memory blocks of a 'system', a
+    'group' and a 'channel', and the 'capacity' of the scanner when empty
+    (or None if it hasn't been seen empty).
+    """
+    try:
+        return json.loads(open(path).read()).get(_key(i, model, firmware))
+    except (OSError, ValueError):
+        return None
+
+
+def save(i, model, firmware, memory, path=MODEL_PATH):
+    try:
+        models = json.loads(open(path).read())
+    except (OSError, ValueError):
+        models = {}
+
+    models[_key(i, model, firmware)] = memory
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    tmp = path + '.tmp'
+    open(tmp, 'w').write(json.dumps(models, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def calibrate(i):
+    """
+    Measure what a system, a group and a channel cost by creating a
+    throwaway system with one group and PROBE_CHANNELS channels, reading the
+    free memory (RMB) after each step, and deleting it again.  The capacity
+    is estimated from the free memory and the used percentage (MEM); it is
+    only a guess until record_capacity() is given the free memory of an
+    empty scanner.
+
+    Raises UnidenOutOfResourcesError if there is no room for the probe.
+
+    This command is only acceptable in Programming Mode.
+    """
+    free = i.get_free_memory()
+    used = i.get_used_memory()
+
+    system = i.create_system(SYSTEM_TYPE_CONVENTIONAL)
+
+    try:
+        after_system = i.get_free_memory()
+        group = i.append_channel_group(system)
+        after_group = i.get_free_memory()
+
+        for n in range(PROBE_CHANNELS):
+            if i.append_channel(group) == "-1":
+                raise UnidenOutOfResourcesError
+
+        after_channels = i.get_free_memory()
+    finally:
+        i.delete_system(system)
+
+    return {
+        'system': free - after_system,
+        'group': after_system - after_group,
+        'channel': (after_group - after_channels) / PROBE_CHANNELS,
+        'capacity': None,
+        'estimated_capacity': used < 100 and free * 100 // (100 - used) or free,
+    }
+
+
+def record_capacity(i, model, firmware, path=MODEL_PATH):
+    """
+    Store the free memory of the scanner, which has just been cleared, as
+    the capacity of that model and firmware.
+
+    This command is only acceptable in Programming Mode.
+    """
+    memory = load(i, model, firmware, path)
+
+    if memory is not None:
+        memory['capacity'] = i.get_free_memory()
+        save(i, model, firmware, memory, path)
+
+
+def system_cost(system, memory):
+    """Returns the number of memory blocks programming system will take."""
+    groups = system.get('groups', [])
+
+    return memory['system'] + len(groups) * memory['group'] + \
+        sum(len(g.get('channels', [])) for g in groups) * memory['channel']
+
+
+class Budget:
+    """
+    Whether a document's systems fit in the scanner's memory.
+
+    self.costs is a list of (system name, blocks) in document order,
+    self.needed their total and self.capacity what the scanner holds.
+    """
+    def __init__(self, systems, memory):
+        self.costs = [(s['name'], system_cost(s, memory)) for s in systems]
+        self.needed = math.ceil(sum(cost for _, cost in self.costs))
+        self.capacity = memory['capacity'] or memory['estimated_capacity']
+        self.estimated = memory['capacity'] is None
+
+    def fits(self):
+        return self.needed <= self.capacity
+
+    def trim(self):
+        """
+        Returns the fewest systems that could be left out to make the rest
+        fit, largest first, as (position, name, blocks).
+        """
+        over = self.needed - self.capacity
+        largest = sorted(enumerate(self.costs), key=lambda c: -c[1][1])
+        trimmed = []
+
+        for n, (name, cost) in largest:
+            if over <= 0:
+                break
+
+            trimmed.append((n, name, cost))
+            over -= cost
+
+        return trimmed
+
+
+def memory_model(i, model, firmware, path=MODEL_PATH):
+    """
+    Returns the stored memory model for that model and firmware, calibrating
+    and storing one first if there isn't one, or None if there is no room to
+    calibrate.  Calibrating writes to the scanner; see calibrate().
+
+    This command is only acceptable in Programming Mode.
+    """
+    memory = load(i, model, firmware, path)
+
+    if memory is None:
+        try:
+            memory = calibrate(i)
+        except UnidenError:
+            return None
+
+        save(i, model, firmware, memory, path)
+
+    return memory
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+#
+# Share one scanner between several programs.
+#
+# The daemon owns the serial port and listens on a Unix socket.  Clients send
+# the same CR-terminated command frames they would send to the scanner and get
+# the scanner's reply frames back, so a ClientInterface behaves exactly like an
+# Interface opened on the port itself.
+#
+#   usage: python -m bc246t.daemon [port] [socket]
+#
+# Program Mode belongs to one client at a time.  While a client has it, the
+# other clients' PRG, EPG and scan mode commands (STS, GID, WIN, KEY, POF) wait
+# until it calls exit_program_mode() as many times as it called
+# enter_program_mode(), or disconnects.
+#
+# A command that is waiting its turn is reported to the client with a QUEUED
+# byte every QUEUED_INTERVAL seconds, so that its timeout only counts the time
+# the scanner takes to answer.
+
+import os
+import serial
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from . import Interface, READ_POLL_INTERVAL
+from .scheduler import Scheduler
+
+DEFAULT_SOCKET = os.environ.get('BC246T_SOCKET', '/tmp/bc246t.sock')
+
+# Commands whose meaning depends on whether the scanner is in Program Mode.
+MODE_COMMANDS = ("PRG", "EPG", "STS", "GID", "WIN", "KEY", "POF")
+
+QUEUED = b"\x00"
+QUEUED_INTERVAL = 0.5
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.lock = threading.Lock()
+        self.since = None
+        self.closed = threading.Event()
+
+        threading.Thread(target=self.__report, daemon=True).start()
+
+    def __report(self):
+        """While a command has been waiting QUEUED_INTERVAL or more, say so."""
+        while not self.closed.wait(QUEUED_INTERVAL):
+            with self.lock:
+                if self.since is not None and time.monotonic() - self.since >= QUEUED_INTERVAL:
+                    try:
+                        self.request.sendall(QUEUED)
+                    except OSError:
+                        return
+
+    def handle(self):
+        buf = bytearray()
+
+        while True:
+            data = self.request.recv(4096)
+
+            if len(data) == 0:
+                return
+
+            buf += data
+
+            while True:
+                end = buf.find(b"\r")
+
+                if end == -1:
+                    break
+
+                line = buf[:end].decode()
+                del buf[:end + 1]
+
+                with self.lock:
+                    self.since = time.monotonic()
+
+                reply = self.server.transact(line, self)
+
+                with self.lock:
+                    self.since = None
+                    self.request.sendall(("%s\r" % reply).encode())
+
+    def finish(self):
+        self.closed.set()
+        self.server.release(self)
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serve the given Interface to clients connecting on a Unix socket.
+
+    Each client gets its own thread; commands from all of them are passed to
+    the scanner one at a time through the Interface's Scheduler (one is
+    created if it has none), so keypresses and status polls go ahead of queued
+    bulk reads and otherwise clients are served first come first served.  If
+    the scanner fails to answer a command, the client that sent it is
+    disconnected.
+
+    A client's commands are handled one line at a time: each one waits for
+    its reply before the next is sent to the scanner.  A client's pipeline()
+    still works, but its commands get no overlap on the scanner's side.
+
+    Program Mode is handed out to one client at a time; see the top of this
+    file.
+    """
+    daemon_threads = True
+
+    def __init__(self, interface, path=DEFAULT_SOCKET):
+        if interface.scheduler is None:
+            interface.scheduler = Scheduler()
+
+        self.interface = interface
+        self.mode = threading.Condition()
+        self.owner = None
+        self.depth = 0
+
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise OSError("another daemon is listening on %s" % path)
+            finally:
+                probe.close()
+
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+
+    def transact(self, line, client):
+        """Send line to the scanner for client and return the reply."""
+        cmd = line.split(",", 1)[0]
+
+        if cmd not in MODE_COMMANDS:
+            return self.interface._transact(line)
+
+        with self.mode:
+            while self.owner is not None and self.owner is not client:
+                self.mode.wait()
+
+            if cmd == "PRG" and self.owner is client:
+                self.depth += 1
+                return "PRG,OK"
+
+            if cmd == "EPG" and self.owner is client and self.depth > 1:
+                self.depth -= 1
+                return "EPG,OK"
+
+            reply = self.interface._transact(line)
+
+            if cmd == "PRG" and reply == "PRG,OK":
+                self.owner, self.depth = client, 1
+            elif cmd == "EPG" and self.owner is client:
+                self.owner, self.depth = None, 0
+                self.mode.notify_all()
+
+            return reply
+
+    def release(self, client):
+        """Take Program Mode back from client, which has gone away."""
+        with self.mode:
+            if self.owner is not client:
+                return
+
+            try:
+                self.interface._transact("EPG")
+            except Exception:
+                pass
+
+            self.owner, self.depth = None, 0
+            self.mode.notify_all()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class _SocketDevice:
+    """
+    Enough of serial.Serial for Interface to talk over a socket.
+
+    read() returns whatever has arrived (up to a few KB) instead of exactly
+    size bytes, or nothing after a short wait; Interface only relies on that.
+    Once the daemon has closed the connection it raises SerialException, as
+    pyserial does for a port that has gone away.
+    QUEUED bytes from the daemon are dropped, and while they keep coming
+    read() waits for the reply rather than returning nothing, so the time a
+    command spends queued behind other clients doesn't count towards its
+    timeout.
+    """
+    in_waiting = 0
+
+    def __init__(self, path):
+        self.port = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.sock.settimeout(READ_POLL_INTERVAL)
+        self.queued_until = 0
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def read(self, size=1):
+        while True:
+            try:
+                data = self.sock.recv(max(size, 4096))
+            except socket.timeout:
+                if time.monotonic() < self.queued_until:
+                    continue
+
+                return b""
+
+            if len(data) == 0:
+                raise serial.SerialException("%s: connection closed by the daemon" % self.port)
+
+            if QUEUED in data:
+                self.queued_until = time.monotonic() + 2 * QUEUED_INTERVAL
+                data = data.replace(QUEUED, b"")
+
+                if not data:
+                    continue
+
+            self.queued_until = 0
+            return data
+
+    def reset_input_buffer(self):
+        self.sock.setblocking(False)
+
+        try:
+            while self.sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        finally:
+            self.sock.settimeout(READ_POLL_INTERVAL)
+
+    def close(self):
+        self.sock.close()
+
+
+class ClientInterface(Interface):
+    """
+    An Interface that talks to the scanner through a running Daemon.  Other
+    arguments are as for Interface; timeouts should be longer than
+    2 * QUEUED_INTERVAL.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, **kwargs):
+        Interface.__init__(self, device=_SocketDevice(path), **kwargs)
+
+
+def main(port="/dev/ttyS0", path=DEFAULT_SOCKET):
+    server = Daemon(Interface(port), path)
+
+    print("[*] Serving %s on %s" % (port, path))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3:
+        print(f'usage: {sys.argv[0]} [port] [socket]')
+        sys.exit(-1)
+
+    main(*sys.argv[1:])
@@ -0,0 +1,369 @@
+import difflib
+
+from . import SYSTEM_DEFAULTS, GROUP_DEFAULTS, CHANNEL_DEFAULTS
+from .tree import read_settings, read_system, read_tree
+
+SETTINGS = (
+    ('backlight', 'set_backlight'),
+    ('battery_save', 'set_battery_savings_mode'),
+    ('key_beep', 'set_key_beep'),
+    ('greeting', 'set_greeting'),
+    ('priority_mode', 'set_priority_mode'),
+)
+
+
+def _quick_key(position):
+    return position < 10 and position or None
+
+
+def _values(record, defaults):
+    v = {}
+
+    for k in defaults:
+        v[k] = record.get(k)
+
+        if v[k] is None:
+            v[k] = defaults[k]
+
+    return v
+
+
+def _system_values(s, position):
+    v = _values(s, SYSTEM_DEFAULTS)
+    v['quick_key'] = _quick_key(position)
+    return v
+
+
+def _group_values(g, position):
+    v = _values(g, GROUP_DEFAULTS)
+    v['quick_key'] = _quick_key(position)
+    v.pop('group_type')
+    return v
+
+
+def _channel_values(c):
+    return _values(c, CHANNEL_DEFAULTS)
+
+
+def _differs(current, name_key, name, v):
+    return current[name_key] != name or any(current[k] != v[k] for k in v)
+
+
+def _channel_differs(current, c):
+    return current['name'] != c['name'] or current['frequency'] != c['frequency'] or \
+        current['modulation'] != c['modulation'] or \
+        any(current[k] != v for k, v in _channel_values(c).items())
+
+
+def _align(current, desired, key, compatible):
+    """
+    Pair current records with desired ones.  Returns (pairs, deletes, appends).
+
+    The scanner can only append to a list, so whatever is kept has to stay in
+    order and everything new goes on the end.  Records are matched by key for
+    as long as the two lists only differ by deletions; from the first change
+    that would need an insertion on, the remaining records are overwritten in
+    place, position by position, which is never more commands than deleting
+    and appending them.
+    """
+    pairs, deletes = [], []
+    ci = di = 0
+
+    matcher = difflib.SequenceMatcher(None, [key(c) for c in current],
+        [key(d) for d in desired], autojunk=False)
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            pairs.extend(zip(current[i1:i2], desired[j1:j2]))
+        elif tag == 'delete':
+            deletes.extend(current[i1:i2])
+        else:
+            break
+
+        ci, di = i2, j2
+
+    rest_c, rest_d = current[ci:], desired[di:]
+    n = 0
+
+    while n < len(rest_c) and n < len(rest_d) and compatible(rest_c[n], rest_d[n]):
+        pairs.append((rest_c[n], rest_d[n]))
+        n += 1
+
+    return pairs, deletes + rest_c[n:], rest_d[n:]
+
+
+def _channel_cost(c):
+    return 2
+
+def _group_cost(g):
+    return 2 + sum(_channel_cost(c) for c in g.get('channels', []))
+
+def _system_cost(s):
+    return 2 + sum(_group_cost(g) for g in s.get('groups', []))
+
+
+def _create_channel(i, group_idx, c):
+    idx = i.append_channel(group_idx)
+    i.set_channel_info(idx, c['name'], c['frequency'], c['modulation'], _channel_values(c))
+
+def _create_group(i, system_idx, g, position):
+    idx = i.append_channel_group(system_idx)
+    i.set_group_info(idx, g['group_name'], _group_values(g, position))
+
+    for c in g.get('channels', []):
+        _create_channel(i, idx, c)
+
+def _create_system(i, s, position):
+    idx = i.create_system(s['system_type'])
+    i.set_system_info(idx, s['name'], _system_values(s, position))
+
+    for n, g in enumerate(s.get('groups', [])):
+        _create_group(i, idx, g, n + 1)
+
+
+def _shape(s):
+    return s['system_type'], tuple(len(g.get('channels', [])) for g in s.get('groups', []))
+
+
+def _channel_key(c):
+    """What set_channel_info() would write for c; equal keys need no update."""
+    return (c['name'], c['frequency'], c['modulation']) + tuple(_channel_values(c).values())
+
+
+def _group_key(g):
+    """What set_group_info() would write for g, apart from its quick key."""
+    return (g['group_name'],) + tuple(_group_values(g, 1).values())
+
+
+def _summary(s):
+    """
+    Returns what Clone needs of a system already created: its name and, for
+    each group, the hash of the group's key and of each of its channels'
+    keys.  Only the hashes are kept, so a summary costs an int per record
+    rather than a copy of every field.
+    """
+    return s['name'], [(hash(_group_key(g)),
+        [hash(_channel_key(c)) for c in g.get('channels', [])]) for g in s.get('groups', [])]
+
+
+class Clone:
+    """
+    How to make a system by copying one already on the scanner (CPS) and
+    patching what differs, rather than creating it record by record.
+
+    The two systems have the same type and the same number of channels in
+    each group, so their records pair up by position.  source is the
+    _summary() of the system to copy and self.name its name.  self.groups is
+    the positions of the groups to update and self.channels maps a group's
+    position to the positions of its channels to update.  self.commands is
+    the number of commands that takes: the copy, the system's settings
+    (whose quick key depends on its position), reading the copy's groups
+    and the channels of the groups being patched, and the updates.
+    """
+    def __init__(self, source, idx, system):
+        self.name, groups = source
+        self.idx = idx
+        self.groups = []
+        self.channels = {}
+
+        for n, ((key, channels), g) in enumerate(zip(groups, system.get('groups', []))):
+            if key != hash(_group_key(g)):
+                self.groups.append(n)
+
+            changed = [m for m, (c, d) in enumerate(zip(channels, g['channels']))
+                if c != hash(_channel_key(d))]
+
+            if changed:
+                self.channels[n] = changed
+
+        read = len(system.get('groups', [])) + \
+            sum(len(system['groups'][n]['channels']) for n in self.channels)
+
+        self.commands = 3 + read + len(self.groups) + \
+            sum(len(changed) for changed in self.channels.values())
+
+    def apply(self, i, idx, system, position):
+        """
+        Patch the copy of the source system at idx into system, which is
+        position'th (counting from 1).
+
+        This command is only acceptable in Programming Mode.
+        """
+        i.set_system_info(idx, system['name'], _system_values(system, position))
+
+        if not self.groups and not self.channels:
+            return
+
+        copy = read_system(i, idx, self.channels)
+
+        for n in self.groups:
+            g = system['groups'][n]
+            i.set_group_info(copy['groups'][n]['index'], g['group_name'], _group_values(g, n + 1))
+
+        for n, changed in self.channels.items():
+            for m in changed:
+                c = system['groups'][n]['channels'][m]
+                i.set_channel_info(copy['groups'][n]['channels'][m]['index'], c['name'],
+                    c['frequency'], c['modulation'], _channel_values(c))
+
+
+class Clones:
+    """
+    Finds, for each system of an import in turn, the cheapest earlier one
+    to copy it from.  Tell it about each system once it is on the scanner
+    with add().
+
+    Only each system's _summary() is kept, so that a streamed import doesn't
+    hold on to every system it has read.
+    """
+    def __init__(self):
+        self.created = {}
+
+    def add(self, system, idx):
+        self.created.setdefault(_shape(system), []).append((_summary(system), idx))
+
+    def find(self, system):
+        """
+        Returns the Clone that makes system in the fewest commands, or None
+        if creating it from scratch takes fewer.
+        """
+        best = None
+
+        for source, idx in self.created.get(_shape(system), []):
+            clone = Clone(source, idx, system)
+
+            if best is None or clone.commands < best.commands:
+                best = clone
+
+        if best is None or best.commands >= _system_cost(system):
+            return None
+
+        return best
+
+
+class ImportPlan:
+    """
+    The commands needed to turn what is on the scanner into a data file's
+    programming, without clearing the scanner first.
+
+    settings and systems are what read_settings() and read_tree() return;
+    data is the document import.py reads.  Each step is a tuple of
+    (description, number of commands, function taking an Interface).
+    """
+    def __init__(self, settings, systems, data):
+        self.steps = []
+
+        for name, setter in SETTINGS:
+            if settings[name] != data['settings'][name]:
+                self.__setting(name, setter, data['settings'][name])
+
+        self.__systems(systems, data['systems'])
+
+    @property
+    def commands(self):
+        return sum(n for _, n, _ in self.steps)
+
+    def __step(self, description, commands, fn):
+        self.steps.append((description, commands, fn))
+
+    def __setting(self, name, setter, value):
+        if name == 'greeting':
+            fn = lambda i: i.set_greeting(*value)
+        else:
+            fn = lambda i: getattr(i, setter)(value)
+
+        self.__step('set %s to %r' % (name, value), 1, fn)
+
+    def __systems(self, current, desired):
+        pairs, deletes, appends = _align(current, desired,
+            lambda s: (s['system_type'], s['name']),
+            lambda c, d: c['system_type'] == d['system_type'])
+
+        for c in deletes:
+            self.__step('delete system %r' % c['name'], 1,
+                lambda i, idx=c['index']: i.delete_system(idx))
+
+        for position, (c, s) in enumerate(pairs, 1):
+            v = _system_values(s, position)
+
+            if _differs(c, 'name', s['name'], v):
+                self.__step('update system %r' % s['name'], 1,
+                    lambda i, idx=c['index'], s=s, v=v: i.set_system_info(idx, s['name'], dict(v)))
+
+            self.__groups(c, s.get('groups', []))
+
+        for position, s in enumerate(appends, len(pairs) + 1):
+            self.__step('create system %r' % s['name'], _system_cost(s),
+                lambda i, s=s, position=position: _create_system(i, s, position))
+
+    def __groups(self, system, desired):
+        pairs, deletes, appends = _align(system['groups'], desired,
+            lambda g: (g.get('group_type', 'C'), g['group_name']),
+            lambda c, d: c['group_type'] == d.get('group_type', 'C'))
+
+        for c in deletes:
+            self.__step('delete group %r from %r' % (c['group_name'], system['name']), 1,
+                lambda i, idx=c['index']: i.delete_group(idx))
+
+        for position, (c, g) in enumerate(pairs, 1):
+            v = _group_values(g, position)
+
+            if _differs(c, 'group_name', g['group_name'], v):
+                self.__step('update group %r' % g['group_name'], 1,
+                    lambda i, idx=c['index'], g=g, v=v: i.set_group_info(idx, g['group_name'], dict(v)))
+
+            self.__channels(c, g.get('channels', []))
+
+        for position, g in enumerate(appends, len(pairs) + 1):
+            self.__step('append group %r to %r' % (g['group_name'], system['name']),
+                _group_cost(g),
+                lambda i, idx=system['index'], g=g, position=position: _create_group(i, idx, g, position))
+
+    def __channels(self, group, desired):
+        pairs, deletes, appends = _align(group['channels'], desired,
+            lambda c: c['name'], lambda c, d: True)
+
+        for c in deletes:
+            self.__step('delete channel %r from %r' % (c['name'], group['group_name']), 1,
+                lambda i, idx=c['index']: i.delete_channel(idx))
+
+        for c, d in pairs:
+            if _channel_differs(c, d):
+                self.__step('update channel %r' % d['name'], 1,
+                    lambda i, idx=c['index'], d=d: i.set_channel_info(idx, d['name'],
+                        d['frequency'], d['modulation'], _channel_values(d)))
+
+        for d in appends:
+            self.__step('append channel %r to %r' % (d['name'], group['group_name']),
+                _channel_cost(d),
+                lambda i, idx=group['index'], d=d: _create_channel(i, idx, d))
+
+    def apply(self, i, progress=None):
+        """
+        Run every step against the scanner, calling progress(description)
+        before each one if given.
+
+        This command is only acceptable in Programming Mode.
+        """
+        for description, _, fn in self.steps:
+            if progress is not None:
+                progress(description)
+
+            fn(i)
+
+
+def plan_import(i, data):
+    """
+    Read the scanner and return the ImportPlan that brings it in line with
+    data.  Also sets plan.read_commands to the number of commands reading
+    took.
+
+    This command is only acceptable in Programming Mode.
+    """
+    systems = read_tree(i)
+    plan = ImportPlan(read_settings(i), systems, data)
+
+    plan.read_commands = len(SETTINGS) + 1 + sum(1 + sum(1 + len(g['channels'])
+        for g in s['groups']) for s in systems)
+
+    return plan
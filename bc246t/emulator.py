@@ -0,0 +1,650 @@
+#!/usr/bin/env python
+#
+# A pretend BC246T, for testing and benchmarking without the real scanner.
+#
+# The emulator speaks the same serial protocol as the scanner over a
+# pseudo-terminal, so Interface(port=emulator.port) can't tell the difference.
+# It keeps systems, groups and channels in linked lists the way the scanner
+# does, and can optionally take as long as a real 57600 baud link would.
+#
+#   usage: python -m bc246t.emulator [data_file]
+#
+# If a data file (as written by export.py) is given, the emulator starts out
+# programmed with it.
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import tty
+
+from .constants import *
+
+# Commands the scanner only accepts in Program Mode.
+PROGRAM_MODE_COMMANDS = ("BLT", "BSV", "CLR", "KBP", "OMS", "PRI", "SCT", "SIH", "SIT",
+    "QSL", "QGL", "CSY", "DSY", "CPS", "SIN", "AGC", "AGI", "DGR", "GIN", "ACC", "ACT",
+    "DCH", "CIN", "TFQ", "REV", "FWD", "RMB", "MEM", "GLF", "ULF", "LOF", "SCO", "CLC",
+    "CSG", "CSP", "WPR", "MCP", "BAV")
+
+IDLE_LINE1 = "    Scanning    "
+IDLE_LINE2 = "                "
+
+
+class Emulator:
+    """
+    An in-memory scanner.
+
+    handle() takes one command frame (without the CR) and returns the reply the
+    scanner would give.  start() serves that over a pty whose path is then in
+    self.port.
+
+    baudrate, if given, makes every frame take as long to send and receive as
+    it would on a serial link at that speed (10 bits per byte); latency is an
+    additional fixed delay per command, in seconds.  turnaround delays each
+    reply on its way back without holding up the next command, the way a USB
+    serial adapter's latency timer does.
+
+    memory_blocks is the size of the scanner's memory; each system, group and
+    channel uses the number of blocks given in self.block_cost.
+    """
+    def __init__(self, baudrate=None, latency=0.0, model="BC246T",
+            firmware="Version 1.01.04", memory_blocks=3000, turnaround=0.0):
+        self.baudrate = baudrate
+        self.latency = latency
+        self.turnaround = turnaround
+        self.model = model
+        self.firmware = firmware
+        self.memory_blocks = memory_blocks
+        self.block_cost = {"system": 2, "group": 1, "channel": 1}
+
+        self.port = None
+        self.commands = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        self.lock = threading.Lock()
+        self.clear()
+
+        self.program_mode = False
+        self.squelch_open = False
+        self.line1 = IDLE_LINE1
+        self.line2 = IDLE_LINE2
+        self.talkgroup = ("", "", "", "", "", "")
+        self.window = ("", "")
+        self.battery = 190
+
+    def clear(self):
+        """Forget all programming, as CLR does."""
+        self.settings = {
+            "BLT": BACKLIGHT_10SEC,
+            "BSV": BATT_SAVE_OFF,
+            "KBP": "1",
+            "OMS": [GREETING_DEFAULT, GREETING_DEFAULT],
+            "PRI": PRIORITY_MODE_OFF,
+            "QSL": "0" * 10,
+            "QGL": "0" * 10,
+            "WPR": WEATHER_PRIORITY_OFF,
+        }
+        self.records = {}
+        self.system_list = []
+        self.next_index = 1
+        self.used_blocks = 0
+
+    ########################################################################
+    ##  Memory model
+    ########################################################################
+
+    def __allocate(self, kind, record):
+        if self.used_blocks + self.block_cost[kind] > self.memory_blocks:
+            return -1
+
+        idx = self.next_index
+        self.next_index += 1
+        self.used_blocks += self.block_cost[kind]
+
+        record["kind"] = kind
+        self.records[idx] = record
+
+        return idx
+
+    def __free(self, idx):
+        record = self.records.pop(idx)
+        self.used_blocks -= self.block_cost[record["kind"]]
+
+        for child in record.get("children", []):
+            self.__free(child)
+
+    def __get(self, idx, kind):
+        try:
+            record = self.records[int(idx)]
+        except (KeyError, ValueError):
+            return None
+
+        if record["kind"] != kind:
+            return None
+
+        return record
+
+    def __siblings(self, idx):
+        record = self.records[idx]
+
+        if record["kind"] == "system":
+            return self.system_list
+
+        return self.records[record["parent"]]["children"]
+
+    def __links(self, idx):
+        siblings = self.__siblings(idx)
+        pos = siblings.index(idx)
+
+        rev = pos > 0 and siblings[pos - 1] or -1
+        fwd = pos < len(siblings) - 1 and siblings[pos + 1] or -1
+
+        return rev, fwd, pos + 1
+
+    def __ends(self, children):
+        return children and (children[0], children[-1]) or (-1, -1)
+
+    def create_system(self, system_type, name=""):
+        idx = self.__allocate("system", {
+            "system_type": system_type,
+            "name": name,
+            "quick_key": ".",
+            "hold_time": "2",
+            "lockout": "0",
+            "attenuation": "0",
+            "delay_time": "2",
+            "data_skip": "0",
+            "emergency_alert": "0",
+            "children": [],
+        })
+
+        if idx != -1:
+            self.system_list.append(idx)
+
+        return idx
+
+    def append_group(self, system_index, group_type="C"):
+        idx = self.__allocate("group", {
+            "group_type": group_type,
+            "name": "",
+            "quick_key": ".",
+            "lockout": "0",
+            "parent": system_index,
+            "children": [],
+        })
+
+        if idx != -1:
+            self.records[system_index]["children"].append(idx)
+
+        return idx
+
+    def append_channel(self, group_index):
+        idx = self.__allocate("channel", {
+            "name": "",
+            "frequency": "00000000",
+            "search_step": "0",
+            "modulation": MOD_AUTO,
+            "ctcss_dcs_mode": "0",
+            "ctcss_dcs_tone_lockout": "0",
+            "lockout": "0",
+            "priority": "0",
+            "attenuation": "0",
+            "alert": "0",
+            "parent": group_index,
+        })
+
+        if idx != -1:
+            self.records[group_index]["children"].append(idx)
+
+        return idx
+
+    def delete(self, idx):
+        self.__siblings(idx).remove(idx)
+        self.__free(idx)
+
+    def copy_system(self, idx, name):
+        source = self.records[idx]
+        new_idx = self.create_system(source["system_type"], name)
+
+        if new_idx == -1:
+            return -1
+
+        for k in ("quick_key", "hold_time", "lockout", "attenuation", "delay_time",
+                "data_skip", "emergency_alert"):
+            self.records[new_idx][k] = source[k]
+
+        for g in source["children"]:
+            group = self.records[g]
+            new_g = self.append_group(new_idx, group["group_type"])
+
+            if new_g == -1:
+                return -1
+
+            for k in ("name", "quick_key", "lockout"):
+                self.records[new_g][k] = group[k]
+
+            for c in group["children"]:
+                new_c = self.append_channel(new_g)
+
+                if new_c == -1:
+                    return -1
+
+                for k, v in self.records[c].items():
+                    if k not in ("parent", "kind"):
+                        self.records[new_c][k] = v
+
+        return new_idx
+
+    def populate(self, data):
+        """
+        Program the emulator directly from a dict in export.py's format,
+        without going through the serial protocol.
+        """
+        def flag(v):
+            return v and "1" or "0"
+
+        for s in data.get("systems", []):
+            s_idx = self.create_system(s["system_type"], s["name"])
+            system = self.records[s_idx]
+
+            if s.get("quick_key") is not None:
+                system["quick_key"] = str(s["quick_key"])
+
+            system["hold_time"] = str(s.get("hold_time", 2))
+            system["delay_time"] = str(s.get("delay_time", 2))
+
+            for k in ("lockout", "attenuation", "data_skip", "emergency_alert"):
+                system[k] = flag(s.get(k))
+
+            for g in s.get("groups", []):
+                g_idx = self.append_group(s_idx, g.get("group_type", "C"))
+                group = self.records[g_idx]
+                group["name"] = g["group_name"]
+                group["lockout"] = flag(g.get("lockout"))
+
+                if g.get("quick_key") is not None:
+                    group["quick_key"] = str(g["quick_key"])
+
+                for c in g.get("channels", []):
+                    channel = self.records[self.append_channel(g_idx)]
+                    channel["name"] = c["name"]
+                    channel["frequency"] = "%08d" % c["frequency"]
+                    channel["modulation"] = c["modulation"]
+
+                    for k in ("search_step", "ctcss_dcs_mode", "priority"):
+                        channel[k] = str(c.get(k, 0))
+
+                    for k in ("ctcss_dcs_tone_lockout", "lockout", "attenuation", "alert"):
+                        channel[k] = flag(c.get(k))
+
+    ########################################################################
+    ##  Protocol
+    ########################################################################
+
+    def handle(self, line):
+        """Returns the reply (without the CR) to one command frame."""
+        with self.lock:
+            self.commands += 1
+
+            cmd, *args = line.split(",")
+
+            if cmd in PROGRAM_MODE_COMMANDS and not self.program_mode:
+                return "%s,NG" % cmd
+
+            handler = getattr(self, "_cmd_%s" % cmd, None)
+
+            if handler is None:
+                return "ERR"
+
+            try:
+                res = handler(*args)
+            except (TypeError, ValueError, KeyError, IndexError):
+                return "ERR"
+
+            if res is None:
+                return "ERR"
+
+            return ",".join([cmd] + [str(v) for v in res])
+
+    def _cmd_MDL(self):
+        return [self.model]
+
+    def _cmd_VER(self):
+        return [self.firmware]
+
+    def _cmd_PRG(self):
+        self.program_mode = True
+        return ["OK"]
+
+    def _cmd_EPG(self):
+        self.program_mode = False
+        return ["OK"]
+
+    def _cmd_KEY(self, key, mode):
+        if key not in KEY_CODE__VALUES or mode not in KEY_MODE__VALUES:
+            return None
+
+        return ["OK"]
+
+    def _cmd_POF(self):
+        return ["OK"]
+
+    def _cmd_STS(self):
+        if self.program_mode:
+            line1, line2 = " Remote Mode    ", " Keypad Lock    "
+        else:
+            line1, line2 = self.line1, self.line2
+
+        return [line1, " " * 16, line2, " " * 16, "0" * 15, "0" * 17, "",
+            self.squelch_open and "1" or "0", "0", "0", "0"]
+
+    def _cmd_GID(self):
+        return list(self.talkgroup)
+
+    def _cmd_WIN(self):
+        return list(self.window)
+
+    def _cmd_BAV(self):
+        return [self.battery]
+
+    def _cmd_CLR(self):
+        self.clear()
+        return ["OK"]
+
+    def __setting(self, cmd, *args):
+        if len(args) == 0:
+            v = self.settings[cmd]
+            return isinstance(v, list) and v or [v]
+
+        if len(args) == 1:
+            self.settings[cmd] = args[0]
+        else:
+            self.settings[cmd] = list(args)
+
+        return ["OK"]
+
+    def _cmd_BLT(self, *args):
+        return self.__setting("BLT", *args)
+
+    def _cmd_BSV(self, *args):
+        return self.__setting("BSV", *args)
+
+    def _cmd_KBP(self, *args):
+        return self.__setting("KBP", *args)
+
+    def _cmd_OMS(self, *args):
+        return self.__setting("OMS", *args)
+
+    def _cmd_PRI(self, *args):
+        return self.__setting("PRI", *args)
+
+    def _cmd_QSL(self, *args):
+        return self.__setting("QSL", *args)
+
+    def _cmd_QGL(self, *args):
+        return self.__setting("QGL", *args)
+
+    def _cmd_WPR(self, *args):
+        return self.__setting("WPR", *args)
+
+    def _cmd_GLF(self):
+        return [-1]
+
+    def _cmd_SCT(self):
+        return [len(self.system_list)]
+
+    def _cmd_SIH(self):
+        return [self.__ends(self.system_list)[0]]
+
+    def _cmd_SIT(self):
+        return [self.__ends(self.system_list)[1]]
+
+    def _cmd_MEM(self):
+        return [self.used_blocks * 100 // self.memory_blocks]
+
+    def _cmd_RMB(self):
+        return [self.memory_blocks - self.used_blocks]
+
+    def _cmd_CSY(self, system_type):
+        if system_type not in SYSTEM_TYPE__VALUES:
+            return None
+
+        return [self.create_system(system_type)]
+
+    def _cmd_DSY(self, idx):
+        if self.__get(idx, "system") is None:
+            return None
+
+        self.delete(int(idx))
+        return ["OK"]
+
+    def _cmd_CPS(self, idx, name):
+        if self.__get(idx, "system") is None:
+            return None
+
+        return [self.copy_system(int(idx), name)]
+
+    def _cmd_SIN(self, idx, *args):
+        system = self.__get(idx, "system")
+
+        if system is None:
+            return None
+
+        if args:
+            keys = ("name", "quick_key", "hold_time", "lockout", "attenuation",
+                "delay_time", "data_skip", "emergency_alert")
+
+            if len(args) != len(keys):
+                return None
+
+            system.update(zip(keys, args))
+            return ["OK"]
+
+        rev, fwd, seq = self.__links(int(idx))
+        head, tail = self.__ends(system["children"])
+
+        return [system["system_type"], system["name"], system["quick_key"],
+            system["hold_time"], system["lockout"], system["attenuation"],
+            system["delay_time"], system["data_skip"], system["emergency_alert"],
+            rev, fwd, head, tail, seq]
+
+    def __append_group(self, idx, group_type):
+        if self.__get(idx, "system") is None:
+            return None
+
+        return [self.append_group(int(idx), group_type)]
+
+    def _cmd_AGC(self, idx):
+        return self.__append_group(idx, "C")
+
+    def _cmd_AGI(self, idx):
+        return self.__append_group(idx, "T")
+
+    def _cmd_DGR(self, idx):
+        if self.__get(idx, "group") is None:
+            return None
+
+        self.delete(int(idx))
+        return ["OK"]
+
+    def _cmd_GIN(self, idx, *args):
+        group = self.__get(idx, "group")
+
+        if group is None:
+            return None
+
+        if args:
+            if len(args) != 3:
+                return None
+
+            group["name"], group["quick_key"], group["lockout"] = args
+            return ["OK"]
+
+        rev, fwd, seq = self.__links(int(idx))
+        head, tail = self.__ends(group["children"])
+
+        return [group["group_type"], group["name"], group["quick_key"], group["lockout"],
+            rev, fwd, group["parent"], head, tail, seq]
+
+    def _cmd_ACC(self, idx):
+        if self.__get(idx, "group") is None:
+            return None
+
+        return [self.append_channel(int(idx))]
+
+    def _cmd_DCH(self, idx):
+        if self.__get(idx, "channel") is None:
+            return None
+
+        self.delete(int(idx))
+        return ["OK"]
+
+    def _cmd_CIN(self, idx, *args):
+        channel = self.__get(idx, "channel")
+
+        if channel is None:
+            return None
+
+        keys = ("name", "frequency", "search_step", "modulation", "ctcss_dcs_mode",
+            "ctcss_dcs_tone_lockout", "lockout", "priority", "attenuation", "alert")
+
+        if args:
+            if len(args) != len(keys) or args[3] not in MOD__VALUES:
+                return None
+
+            channel.update(zip(keys, args))
+            return ["OK"]
+
+        rev, fwd, _ = self.__links(int(idx))
+        group = channel["parent"]
+
+        return [channel[k] for k in keys] + [rev, fwd, self.records[group]["parent"], group]
+
+    def __step(self, idx, n):
+        if int(idx) not in self.records:
+            return None
+
+        rev, fwd, _ = self.__links(int(idx))
+        return [n < 0 and rev or fwd]
+
+    def _cmd_REV(self, idx):
+        return self.__step(idx, -1)
+
+    def _cmd_FWD(self, idx):
+        return self.__step(idx, 1)
+
+    ########################################################################
+    ##  Serial port
+    ########################################################################
+
+    def __wire_time(self, nbytes):
+        return self.baudrate and nbytes * 10.0 / self.baudrate or 0.0
+
+    def __serve(self, fd):
+        buf = bytearray()
+
+        # When the last byte received so far finished coming down the wire.
+        # The link is full duplex, so commands sent back to back keep arriving
+        # while a reply goes out.
+        received = 0.0
+
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except OSError:
+                return
+
+            if len(data) == 0:
+                return
+
+            buf += data
+            self.bytes_in += len(data)
+            received = max(received, time.monotonic())
+
+            while True:
+                end = buf.find(b"\r")
+
+                if end == -1:
+                    break
+
+                line = buf[:end].decode(errors="replace")
+                del buf[:end + 1]
+
+                received += self.__wire_time(len(line) + 1)
+                delay = received - time.monotonic()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                if self.latency:
+                    time.sleep(self.latency)
+
+                reply = ("%s\r" % self.handle(line)).encode()
+
+                if self.baudrate:
+                    time.sleep(self.__wire_time(len(reply)))
+
+                if self.turnaround:
+                    self.__replies.put((time.monotonic() + self.turnaround, reply))
+                else:
+                    os.write(fd, reply)
+
+                self.bytes_out += len(reply)
+
+    def __deliver(self, fd):
+        while True:
+            due, reply = self.__replies.get()
+            delay = due - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                os.write(fd, reply)
+            except OSError:
+                return
+
+    def start(self):
+        """
+        Start answering on a new pty and return its path (also kept in
+        self.port) for Interface to open.
+        """
+        master, slave = os.openpty()
+        tty.setraw(slave)
+
+        self.port = os.ttyname(slave)
+        self._fds = (master, slave)
+
+        if self.turnaround:
+            self.__replies = queue.Queue()
+            threading.Thread(target=self.__deliver, args=(master,), daemon=True).start()
+
+        threading.Thread(target=self.__serve, args=(master,), daemon=True).start()
+
+        return self.port
+
+
+def main(source=None):
+    e = Emulator()
+
+    if source:
+        e.populate(json.loads(open(source).read()))
+
+    print("[*] Emulating a %s on %s" % (e.model, e.start()))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print(f'usage: {sys.argv[0]} [data_file]')
+        sys.exit(-1)
+
+    main(*sys.argv[1:])
@@ -32,4 +32,11 @@ class UnidenUnexpectedResponseError(UnidenError):
         return UnidenError.__init__(self, s)
 
 
+class UnidenAbortedError(UnidenError):
+    def __init__(self, s="Not sent: an earlier command lost sync with the scanner"):
+        return UnidenError.__init__(self, s)
+
 
+class UnidenTimeoutError(UnidenError):
+    def __init__(self, s="Timed out waiting for a response"):
+        return UnidenError.__init__(self, s)
@@ -0,0 +1,303 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+
+from .aio import _mirror
+from .poll import AdaptiveInterval, POLL_FLOOR, POLL_CEILING
+
+EVENT_TRANSMISSION_START = "transmission_start"
+EVENT_TRANSMISSION_END = "transmission_end"
+EVENT_CHANNEL_CHANGE = "channel_change"
+EVENT_TALKGROUP_CHANGE = "talkgroup_change"
+EVENT_WEATHER_ALERT_START = "weather_alert_start"
+EVENT_WEATHER_ALERT_END = "weather_alert_end"
+EVENT__VALUES = (EVENT_TRANSMISSION_START, EVENT_TRANSMISSION_END, EVENT_CHANNEL_CHANGE,
+    EVENT_TALKGROUP_CHANGE, EVENT_WEATHER_ALERT_START, EVENT_WEATHER_ALERT_END)
+
+TALKGROUP_KEYS = ("system_type", "tgid", "id_search_mode", "system_name", "group_name",
+    "tgid_name")
+
+Event = collections.namedtuple("Event", "kind time duration details")
+Event.__doc__ = """
+One thing that happened on the scanner.
+
+kind is one of the EVENT_* constants and time when it was seen, in
+time.time() seconds.  duration is, for the end of a transmission or a weather
+alert, how long it lasted, and for a channel or talkgroup change, how long
+the previous one was shown; otherwise None.  details is a dict of what the
+scanner showed: line1, line2, and, once a transmission has been seen, the
+get_current_talkgroup_id_status() keys plus signal and frequency from
+get_window_voltage() (frequency as an int in export.py's units, or None).
+
+Times are only as exact as the polling: an edge is seen at the first poll
+after it.
+"""
+
+
+class EventDetector:
+    """
+    Turns a series of status readings into Events.  Does no I/O itself.
+    """
+    def __init__(self):
+        self.open = False
+        self.opened_at = None
+        self.lines = None
+        self.lines_at = None
+        self.talkgroup = None
+        self.talkgroup_at = None
+        self.weather_at = None
+        self.details = {}
+
+    def wants_details(self, status):
+        """
+        Whether, given the latest get_status() reply, the talkgroup and window
+        voltage should be read too: when a transmission starts, or what is
+        shown changes during one.
+        """
+        return not status["squelch"] and \
+            (not self.open or (status["line1"], status["line2"]) != self.lines)
+
+    def feed(self, status, talkgroup=None, window=None, now=None):
+        """
+        Takes a get_status() reply, and the get_current_talkgroup_id_status()
+        and get_window_voltage() replies if they were read, and returns the
+        Events since the last call, in order.
+        """
+        if now is None:
+            now = time.time()
+
+        events = []
+        lines = (status["line1"], status["line2"])
+        is_open = not status["squelch"]
+
+        self.details["line1"], self.details["line2"] = lines
+
+        if talkgroup is not None:
+            self.details.update(talkgroup)
+
+        if window is not None:
+            signal, frequency = window
+            self.details["signal"] = signal
+            self.details["frequency"] = frequency.isdigit() and int(frequency) or None
+
+        def event(kind, since=None):
+            duration = None
+
+            if since is not None:
+                duration = now - since
+
+            events.append(Event(kind, now, duration, dict(self.details)))
+
+        if self.open and not is_open:
+            event(EVENT_TRANSMISSION_END, self.opened_at)
+
+        if self.lines is not None and lines != self.lines:
+            event(EVENT_CHANNEL_CHANGE, self.lines_at)
+
+        if lines != self.lines:
+            self.lines, self.lines_at = lines, now
+
+        if talkgroup is not None and talkgroup["tgid"] != "":
+            if self.talkgroup is not None and talkgroup["tgid"] != self.talkgroup:
+                event(EVENT_TALKGROUP_CHANGE, self.talkgroup_at)
+
+            if talkgroup["tgid"] != self.talkgroup:
+                self.talkgroup, self.talkgroup_at = talkgroup["tgid"], now
+
+        if is_open and not self.open:
+            self.opened_at = now
+            event(EVENT_TRANSMISSION_START)
+
+        self.open = is_open
+
+        if status["weather_alert"] and self.weather_at is None:
+            self.weather_at = now
+            event(EVENT_WEATHER_ALERT_START)
+        elif not status["weather_alert"] and self.weather_at is not None:
+            event(EVENT_WEATHER_ALERT_END, self.weather_at)
+            self.weather_at = None
+
+        return events
+
+
+def _read(i, detector):
+    """
+    One poll: STS, then GID and WIN together if detector wants them.
+    Returns (status, talkgroup, window), the last two None if not read.
+    """
+    status = i.get_status()
+
+    if not detector.wants_details(status):
+        return status, None, None
+
+    gid, win = i.pipeline([("GID",), ("WIN",)])
+    talkgroup = window = None
+
+    if isinstance(gid, list) and gid[0] == "GID" and len(gid) == len(TALKGROUP_KEYS) + 1:
+        talkgroup = dict(zip(TALKGROUP_KEYS, gid[1:]))
+
+    if isinstance(win, list) and win[0] == "WIN" and len(win) == 3:
+        window = tuple(win[1:])
+
+    return status, talkgroup, window
+
+
+class EventStream:
+    """
+    Polls a scanner from a background thread and hands every subscriber the
+    same Events, so however many there are, the scanner is polled once and
+    edges are detected once.
+
+        stream = EventStream(i)
+
+        for event in stream.subscribe():
+            print(event.kind, event.details["line1"])
+
+    Polling starts with the first subscriber and runs at the pace of an
+    AdaptiveInterval between floor and ceiling.  Nothing else should send
+    commands through i unless it can be shared between threads (e.g. a
+    ThreadedInterface).  If polling fails, every subscriber's iterator
+    raises the error and the stream stops.
+    """
+    def __init__(self, i, floor=POLL_FLOOR, ceiling=POLL_CEILING):
+        self.i = i
+        self.poll = AdaptiveInterval(floor, ceiling)
+        self.detector = EventDetector()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def subscribe(self):
+        """Returns an iterator over the Events from now on."""
+        q = queue.Queue()
+
+        with self.lock:
+            self.subscribers.append(q)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name="bc246t-events",
+                    daemon=True)
+                self.thread.start()
+
+        return self.__iterate(q)
+
+    def __iterate(self, q):
+        try:
+            while True:
+                event = q.get()
+
+                if isinstance(event, BaseException):
+                    raise event
+
+                if event is None:
+                    return
+
+                yield event
+        finally:
+            with self.lock:
+                if q in self.subscribers:
+                    self.subscribers.remove(q)
+
+    def __publish(self, item):
+        with self.lock:
+            for q in self.subscribers:
+                q.put(item)
+
+    def __run(self):
+        try:
+            while not self.stopped.is_set():
+                status, talkgroup, window = _read(self.i, self.detector)
+
+                for event in self.detector.feed(status, talkgroup, window):
+                    self.__publish(event)
+
+                self.stopped.wait(self.poll.update(status))
+        except BaseException as e:
+            self.__publish(e)
+        else:
+            self.__publish(None)
+
+    def close(self):
+        """Stop polling; every subscriber's iterator ends."""
+        self.stopped.set()
+
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class AsyncEventStream:
+    """
+    EventStream for an AsyncInterface: polling runs as a task on the event
+    loop and each subscriber is an async iterator.
+
+        stream = AsyncEventStream(i)
+
+        async for event in stream.subscribe():
+            ...
+    """
+    def __init__(self, i, floor=POLL_FLOOR, ceiling=POLL_CEILING):
+        self.i = i
+        self.poll = AdaptiveInterval(floor, ceiling)
+        self.detector = EventDetector()
+        self.subscribers = []
+        self.task = None
+
+    def subscribe(self):
+        """Returns an async iterator over the Events from now on."""
+        q = asyncio.Queue()
+        self.subscribers.append(q)
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.__run())
+
+        return self.__iterate(q)
+
+    async def __iterate(self, q):
+        try:
+            while True:
+                event = await q.get()
+
+                if isinstance(event, BaseException):
+                    raise event
+
+                if event is None:
+                    return
+
+                yield event
+        finally:
+            if q in self.subscribers:
+                self.subscribers.remove(q)
+
+    def __publish(self, item):
+        for q in self.subscribers:
+            q.put_nowait(item)
+
+    async def __run(self):
+        read = _mirror(_read)
+
+        try:
+            while True:
+                status, talkgroup, window = await read(self.i, self.detector)
+
+                for event in self.detector.feed(status, talkgroup, window):
+                    self.__publish(event)
+
+                await asyncio.sleep(self.poll.update(status))
+        except asyncio.CancelledError:
+            self.__publish(None)
+            raise
+        except BaseException as e:
+            self.__publish(e)
+
+    async def close(self):
+        """Stop polling; every subscriber's iterator ends."""
+        if self.task is not None:
+            self.task.cancel()
+
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,227 @@
+import collections
+import mmap
+import os
+import re
+import struct
+
+from .events import EVENT_TRANSMISSION_END
+
+# Each segment file is a header followed by fixed-width records:
+#
+#   header  magic, version, record size, records in use, records it holds
+#   record  start time (time.time() seconds), duration (ms), frequency (in
+#           export.py's units), signal level, system name, group name, tgid
+#
+# Strings are latin-1, cut to their field's width and padded with NULs.
+MAGIC = b"BCHL"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ40x")
+RECORD = struct.Struct("<dIIH16s16s12s2x")
+
+HITLOG_DIR = os.path.join(os.environ.get("XDG_DATA_HOME") or
+    os.path.join(os.path.expanduser("~"), ".local", "share"), "bc246t", "hits")
+
+# Records per segment: 65536 records of 64 bytes is 4MB a segment.
+SEGMENT_RECORDS = 65536
+
+SEGMENT_NAME = re.compile(r"^hits-(\d{8})\.seg$")
+
+Hit = collections.namedtuple("Hit", "time duration frequency signal system_name group_name tgid")
+
+
+def _text(s, width):
+    return (s or "").encode("latin-1", "replace")[:width]
+
+
+def _pack(hit):
+    return RECORD.pack(hit.time, int(round(hit.duration * 1000)), hit.frequency or 0,
+        hit.signal or 0, _text(hit.system_name, 16), _text(hit.group_name, 16),
+        _text(hit.tgid, 12))
+
+
+def _unpack(fields):
+    t, duration, frequency, signal, system_name, group_name, tgid = fields
+
+    return Hit(t, duration / 1000, frequency, signal,
+        system_name.rstrip(b"\0").decode("latin-1"), group_name.rstrip(b"\0").decode("latin-1"),
+        tgid.rstrip(b"\0").decode("latin-1"))
+
+
+def hit_from_event(event):
+    """
+    Returns the Hit for a transmission_end Event (see bc246t.events), or None
+    for any other kind of event.
+    """
+    if event.kind != EVENT_TRANSMISSION_END:
+        return None
+
+    details = event.details
+    signal = details.get("signal", "")
+
+    return Hit(event.time - event.duration, event.duration, details.get("frequency"),
+        signal.isdigit() and int(signal) or 0, details.get("system_name"),
+        details.get("group_name"), details.get("tgid"))
+
+
+class _Segment:
+    def __init__(self, path, records=None):
+        """Open the segment at path, creating it to hold records if it doesn't exist."""
+        self.path = path
+        new = not os.path.exists(path)
+
+        self.f = open(path, new and "w+b" or "r+b")
+
+        if new:
+            self.f.truncate(HEADER.size + records * RECORD.size)
+
+        self.map = mmap.mmap(self.f.fileno(), 0)
+
+        if new:
+            HEADER.pack_into(self.map, 0, MAGIC, VERSION, RECORD.size, 0, records)
+
+        magic, version, size, self.count, self.capacity = HEADER.unpack_from(self.map, 0)
+
+        if magic != MAGIC or version != VERSION or size != RECORD.size or \
+                len(self.map) < HEADER.size + self.capacity * RECORD.size:
+            self.close()
+            raise ValueError("%s is not a hit log segment" % path)
+
+        self.count = min(self.count, self.capacity)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, record):
+        offset = HEADER.size + self.count * RECORD.size
+        self.map[offset:offset + RECORD.size] = record
+        self.count += 1
+
+        # The count goes in after the record, so a crash never exposes half
+        # a record.
+        struct.pack_into("<Q", self.map, 8, self.count)
+
+    def records(self):
+        end = HEADER.size + self.count * RECORD.size
+        return RECORD.iter_unpack(self.map[HEADER.size:end])
+
+    def first_time(self):
+        return self.count and RECORD.unpack_from(self.map, HEADER.size)[0] or None
+
+    def last_time(self):
+        if not self.count:
+            return None
+
+        return RECORD.unpack_from(self.map, HEADER.size + (self.count - 1) * RECORD.size)[0]
+
+    def close(self):
+        self.map.close()
+        self.f.close()
+
+
+class HitLog:
+    """
+    An append-only log of Hits in a directory of memory-mapped segment files.
+
+    Every record is RECORD.size bytes, so a segment is written by copying a
+    record into the map and read by unpacking the map in one go.  Segments
+    are created full size and hold records_per_segment records; when one is
+    full the next is started, and if keep is given only the newest keep
+    segments are kept.
+
+        log = HitLog()
+        log.append(hit)
+
+        for hit in log.scan(since=time.time() - 86400):
+            ...
+
+    Only one process should append to a directory at a time.
+    """
+    def __init__(self, directory=HITLOG_DIR, records_per_segment=SEGMENT_RECORDS, keep=None):
+        self.directory = os.path.expanduser(directory)
+        self.records_per_segment = records_per_segment
+        self.keep = keep
+        self.current = None
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def segments(self):
+        """Returns the paths of the segment files, oldest first."""
+        names = [n for n in os.listdir(self.directory) if SEGMENT_NAME.match(n)]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def __next_path(self):
+        segments = self.segments()
+        n = segments and int(SEGMENT_NAME.match(os.path.basename(segments[-1])).group(1)) + 1 or 0
+
+        return os.path.join(self.directory, "hits-%08d.seg" % n)
+
+    def __rotate(self):
+        if self.current is not None:
+            self.current.close()
+
+        self.current = _Segment(self.__next_path(), self.records_per_segment)
+
+        if self.keep is not None:
+            for path in self.segments()[:-self.keep]:
+                os.remove(path)
+
+    def append(self, hit):
+        if self.current is None:
+            segments = self.segments()
+
+            if segments:
+                self.current = _Segment(segments[-1])
+
+        if self.current is None or self.current.full:
+            self.__rotate()
+
+        self.current.append(_pack(hit))
+
+    def follow(self, events):
+        """
+        Append a Hit for each transmission_end in events (e.g. an
+        EventStream subscription) until it runs out.
+        """
+        for event in events:
+            hit = hit_from_event(event)
+
+            if hit is not None:
+                self.append(hit)
+
+    def scan(self, since=None, until=None):
+        """
+        Yields the Hits that started at or after since and before until
+        (time.time() seconds; None for no limit), oldest first.  Segments
+        wholly outside the range are skipped without reading their records.
+        """
+        for path in self.segments():
+            if self.current is not None and path == self.current.path:
+                segment, opened = self.current, False
+            else:
+                segment, opened = _Segment(path), True
+
+            try:
+                first, last = segment.first_time(), segment.last_time()
+
+                if first is None or since is not None and last < since or \
+                        until is not None and first >= until:
+                    continue
+
+                for fields in segment.records():
+                    if (since is None or fields[0] >= since) and \
+                            (until is None or fields[0] < until):
+                        yield _unpack(fields)
+            finally:
+                if opened:
+                    segment.close()
+
+    def flush(self):
+        if self.current is not None:
+            self.current.map.flush()
+
+    def close(self):
+        if self.current is not None:
+            self.current.map.flush()
+            self.current.close()
+            self.current = None
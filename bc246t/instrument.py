@@ -0,0 +1,142 @@
+import collections
+import sys
+import time
+
+
+class CommandEvent:
+    """
+    What Interface passes to its hooks after each command (or each attempt at
+    one, when it is retried).
+
+        command     command name, e.g. "CIN"
+        sent        the frame sent, without the CR
+        received    the reply frame, without the CR, or None if none came
+        elapsed     seconds from sending the command to decoding its reply
+        attempt     0 for the first try, 1 for the first retry, and so on
+        error       the UnidenError the command failed with, or None
+    """
+    __slots__ = ("command", "sent", "received", "elapsed", "attempt", "error", "time")
+
+    def __init__(self, sent, received, elapsed, attempt=0, error=None):
+        self.command = sent.split(",", 1)[0]
+        self.sent = sent
+        self.received = received
+        self.elapsed = elapsed
+        self.attempt = attempt
+        self.error = error
+        self.time = time.time()
+
+    @property
+    def bytes_sent(self):
+        return len(self.sent) + 1
+
+    @property
+    def bytes_received(self):
+        return self.received is not None and len(self.received) + 1 or 0
+
+    def __repr__(self):
+        return "<CommandEvent %s %.1fms attempt=%d error=%r>" % (self.command,
+            self.elapsed * 1000, self.attempt, self.error)
+
+
+class LatencyHistogram:
+    """
+    Counts latencies in buckets that double in width, from under 0.25ms up
+    to 8s and over.
+    """
+    BOUNDS = tuple(0.00025 * 2 ** n for n in range(16))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        n = 0
+        while n < len(self.BOUNDS) and elapsed > self.BOUNDS[n]:
+            n += 1
+
+        self.counts[n] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    @property
+    def mean(self):
+        return self.count and self.total / self.count or 0.0
+
+    def percentile(self, p):
+        """
+        Returns the upper bound of the bucket holding the p-th (0-1)
+        latency, or the largest latency seen if that is in the last bucket.
+        """
+        if self.count == 0:
+            return 0.0
+
+        seen = 0
+        for n, c in enumerate(self.counts):
+            seen += c
+
+            if seen >= self.count * p:
+                return n < len(self.BOUNDS) and min(self.BOUNDS[n], self.max) or self.max
+
+        return self.max
+
+
+class Instrumentation:
+    """
+    A hook for Interface.add_hook() that keeps per-command latency histograms
+    and the last few frames sent and received, e.g.:
+
+        stats = Instrumentation(dump_on_error=sys.stderr)
+        i.add_hook(stats)
+        ...
+        stats.report()
+
+    If dump_on_error is a file, the recent frames are written to it whenever a
+    command fails.
+    """
+    def __init__(self, frames=64, dump_on_error=None):
+        self.histograms = collections.defaultdict(LatencyHistogram)
+        self.frames = collections.deque(maxlen=frames)
+        self.retries = collections.Counter()
+        self.errors = collections.Counter()
+        self.dump_on_error = dump_on_error
+
+    def __call__(self, event):
+        self.histograms[event.command].add(event.elapsed)
+        self.frames.append(event)
+
+        if event.attempt:
+            self.retries[event.command] += 1
+
+        if event.error is not None:
+            self.errors[event.command] += 1
+
+            if self.dump_on_error is not None:
+                self.dump(self.dump_on_error)
+
+    def dump(self, out=sys.stderr):
+        """Write the recent frames, oldest first."""
+        for e in self.frames:
+            out.write("%s %-4s %7.1fms  SEND %-24s RECV %s%s\n" % (
+                time.strftime("%H:%M:%S", time.localtime(e.time)), e.command,
+                e.elapsed * 1000, e.sent, e.received,
+                e.error is not None and "  (%s)" % e.error or ""))
+
+        out.flush()
+
+    def report(self, out=sys.stderr):
+        """Write a table of time spent per command, most expensive first."""
+        out.write("%-4s %7s %9s %8s %8s %8s %7s %6s\n" % ("cmd", "count", "total s",
+            "mean ms", "p50 ms", "p99 ms", "retries", "errors"))
+
+        rows = sorted(self.histograms.items(), key=lambda kv: -kv[1].total)
+
+        for cmd, h in rows:
+            out.write("%-4s %7d %9.3f %8.2f %8.2f %8.2f %7d %6d\n" % (cmd, h.count, h.total,
+                h.mean * 1000, h.percentile(.5) * 1000, h.percentile(.99) * 1000,
+                self.retries[cmd], self.errors[cmd]))
+
+        out.flush()
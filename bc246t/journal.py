@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+
+from . import UnidenError
+from .snapshot import SNAPSHOT_DIR
+
+
+def default_path(i):
+    """Returns where to keep the journal of an import to the scanner on i's port."""
+    port = getattr(i.device, 'port', None) or 'scanner'
+    name = re.sub(r'[^A-Za-z0-9.]+', '_', 'import-%s' % port).strip('_')
+
+    return os.path.join(SNAPSHOT_DIR, name + '.journal')
+
+
+def digest(path):
+    """Returns a hash of the file at path, to tell whether it is the one a journal is of."""
+    h = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+class Journal:
+    """
+    An append-only record of what an import has done to the scanner, so that
+    an import that dies part way can carry on from where it got to rather
+    than clearing the scanner and starting again.
+
+    Records are identified by their position in the document: (s,) for the
+    s'th system, (s, g) for a group and (s, g, c) for a channel.  Each line
+    of the file is one JSON object:
+
+        {"begin": digest}           the import of the file with that digest
+        {"settings": true}          memory was cleared and the settings set
+        {"create": position, "index": idx}
+                                    the record was appended at idx
+        {"create": position, "index": idx, "clone": true}
+                                    the system was copied from another
+                                    one, groups and channels included
+        {"set": position}           its set_*_info() went through
+
+    Every line is flushed as soon as it is written, so a crash of the
+    program loses nothing; each system's lines are also synced to disk when
+    the next system is started.  A last line cut short is ignored.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.digest = None
+        self.settings = False
+        self.created = {}
+        self.clones = set()
+        self.finished = set()
+        self.f = None
+
+    @classmethod
+    def load(cls, path):
+        """Returns the journal at path, or None if there isn't one."""
+        try:
+            lines = open(path).read().split('\n')
+        except OSError:
+            return None
+
+        journal = cls(path)
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            journal.__apply(entry)
+
+        if journal.digest is None:
+            return None
+
+        return journal
+
+    def __apply(self, entry):
+        if 'begin' in entry:
+            self.digest = entry['begin']
+        elif 'settings' in entry:
+            self.settings = True
+        elif 'create' in entry:
+            self.created[tuple(entry['create'])] = entry['index']
+
+            if entry.get('clone'):
+                self.clones.add(tuple(entry['create']))
+        elif 'set' in entry:
+            self.finished.add(tuple(entry['set']))
+
+    def __write(self, entry, sync=False):
+        self.__apply(entry)
+        self.f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.f.flush()
+
+        if sync:
+            os.fsync(self.f.fileno())
+
+    def begin(self, digest):
+        """Start a new journal, throwing away whatever was in the old one."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self.digest = None
+        self.settings = False
+        self.created = {}
+        self.clones = set()
+        self.finished = set()
+        self.f = open(self.path, 'w')
+        self.__write({'begin': digest}, True)
+
+    def reopen(self):
+        """Carry on writing to a journal that was loaded."""
+        self.f = open(self.path, 'a')
+
+    def settings_done(self):
+        self.__write({'settings': True}, True)
+
+    def create(self, position, idx, clone=False):
+        entry = {'create': list(position), 'index': int(idx)}
+
+        if clone:
+            entry['clone'] = True
+
+        self.__write(entry, len(position) == 1)
+
+    def set(self, position):
+        self.__write({'set': list(position)})
+
+    def index(self, position):
+        """Returns the index the record at position was created at, or None."""
+        return self.created.get(tuple(position))
+
+    def is_set(self, position):
+        return tuple(position) in self.finished
+
+    def is_clone(self, position):
+        return tuple(position) in self.clones
+
+    def close(self, success=False):
+        """Close the journal; once the import is done, it is removed."""
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+        if success:
+            os.remove(self.path)
+
+    def counts(self):
+        """Returns the number of systems, groups and channels created so far."""
+        n = [0, 0, 0]
+
+        for position in self.created:
+            n[len(position) - 1] += 1
+
+        return tuple(n)
+
+    def __children(self, parent):
+        depth = len(parent) + 1
+
+        return sorted(p for p in self.created if len(p) == depth and p[:-1] == parent)
+
+    def check(self, i):
+        """
+        Check that the scanner still holds what the journal says was created,
+        linked together in the same order, and delete the record that was
+        being appended when the import died if it was never journaled.
+
+        Every system and group is read (pipelined); channels are checked by
+        the ends of each group's channel list.  What is inside a system that
+        was copied isn't checked.  Raises ValueError if the scanner doesn't
+        match.
+
+        This command is only acceptable in Programming Mode.
+        """
+        systems = self.__children(())
+        expected = [self.created[p] for p in systems]
+
+        self.__check_list(i, 'system', (), expected, i.get_system_index_tail())
+
+        infos = i.get_system_infos(expected)
+        groups = []
+
+        for p, info in zip(systems, infos):
+            children = self.__children(p)
+            indices = [self.created[c] for c in children]
+
+            if isinstance(info, UnidenError):
+                raise ValueError('system %d (index %d) is gone' % (p[0], self.created[p]))
+
+            if p in self.clones:
+                continue
+
+            if indices and info['group_head_index'] != indices[0]:
+                raise ValueError('system %d does not start with its first group' % p[0])
+
+            self.__check_list(i, 'group', p, indices, info['group_tail_index'])
+            groups.extend(children)
+
+        infos = i.get_group_infos([self.created[p] for p in groups])
+
+        for p, info in zip(groups, infos):
+            indices = [self.created[c] for c in self.__children(p)]
+
+            if isinstance(info, UnidenError) or info['system_index'] != self.created[p[:1]]:
+                raise ValueError('group %d.%d (index %d) is gone' % (p + (self.created[p],)))
+
+            if indices and info['channel_head_index'] != indices[0]:
+                raise ValueError('group %d.%d does not start with its first channel' % p)
+
+            self.__check_list(i, 'channel', p, indices, info['channel_tail_index'])
+
+    def __check_list(self, i, kind, parent, indices, tail):
+        """
+        The list of kind under parent should end at the last of indices.  If
+        it has one more record on the end, linked back to that one, the
+        import died between appending it and journaling it: delete it.
+        Anything else raises ValueError.
+        """
+        last = indices and indices[-1] or -1
+        where = parent and '.'.join(str(n) for n in parent) or 'the scanner'
+
+        if tail == last:
+            return
+
+        if tail == -1:
+            raise ValueError('the %ss of %s are gone' % (kind, where))
+
+        getter, deleter = {
+            'system': (i.get_system_info, i.delete_system),
+            'group': (i.get_group_info, i.delete_group),
+            'channel': (i.get_channel_info, i.delete_channel),
+        }[kind]
+
+        try:
+            previous = getter(tail)['reverse_index'] or -1
+        except UnidenError:
+            previous = None
+
+        if previous != last:
+            raise ValueError('the %ss of %s do not match the journal' % (kind, where))
+
+        deleter(tail)
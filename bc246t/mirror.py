@@ -0,0 +1,382 @@
+import threading
+
+from . import Interface, PIPELINE_WINDOW, UnidenError, UnidenValueError, _is_idempotent
+
+SETTING_COMMANDS = ("BLT", "BSV", "KBP", "OMS", "PRI")
+RECORD_COMMANDS = ("SIN", "GIN", "CIN")
+
+# Commands that can't change the scanner's programming even though they aren't
+# queries.  Edits made from the keypad are caught by the fingerprint check when
+# Program Mode is entered.
+NEUTRAL_COMMANDS = ("PRG", "EPG", "KEY", "POF", "QSH")
+
+# Where things are in the SIN, GIN and CIN replies: the first field set_*_info()
+# writes, the reverse and forward links, the parent index, and the child list's
+# head and tail.
+FIELDS = {"SIN": 2, "GIN": 2, "CIN": 1}
+LINKS = {"SIN": (10, 11), "GIN": (5, 6), "CIN": (11, 12)}
+PARENT = {"GIN": ("SIN", 7), "CIN": ("GIN", 14)}
+CHILDREN = {"SIN": ("GIN", 12, 13), "GIN": ("CIN", 8, 9)}
+SEQUENCE = {"SIN": 14, "GIN": 10}
+
+# The command that appends each kind of record, and the kind it appends.
+APPENDS = {"CSY": "SIN", "AGC": "GIN", "AGI": "GIN", "ACC": "CIN"}
+DELETES = {"DSY": "SIN", "DGR": "GIN", "DCH": "CIN"}
+
+
+def _wire(v):
+    return v.__class__ is bool and (v and "1" or "0") or str(v)
+
+
+def _key(idx):
+    try:
+        return int(idx)
+    except (TypeError, ValueError):
+        return None
+
+
+class MirroredInterface(Interface):
+    """
+    An Interface that keeps a copy of the scanner's programming in memory.
+
+    The replies to get_system_info(), get_group_info(), get_channel_info()
+    (and their pipelined get_*_infos() forms) and to the settings getters are
+    kept, keyed by record index, and served from memory the next time they
+    are asked for.  set_*_info(), create_system(), append_*(), delete_*() and
+    the settings setters update the copy as they go, so it stays right
+    without being re-read.  Anything else that might change the programming
+    throws the copy away.
+
+    The copy is also thrown away by clear_all_memory(), and when Program Mode
+    is entered and a fingerprint of the scanner's memory--the MEM, RMB, SCT,
+    SIH and SIT replies--differs from the one taken when the mirror last left
+    Program Mode.  The scanner can only be edited from the keypad outside
+    Program Mode, so that is where changes made behind the mirror's back can
+    come from.  The fingerprint is cheap rather than exact (renaming a
+    channel from the keypad doesn't change it), so call invalidate() if the
+    scanner may have been edited in a way it can't see.  Settings are
+    re-read once each time Program Mode is entered.
+
+    Any other keyword arguments (timeout, retries, backoff) are passed on to
+    Interface.
+    """
+    def __init__(self, port="/dev/ttyS0", baudrate=57600, device=None, scheduler=None, **kwargs):
+        Interface.__init__(self, port, baudrate, device, scheduler, **kwargs)
+
+        self._mirror_lock = threading.RLock()
+        self._generation = 0
+        self._fingerprint = None
+        self._dirty = False
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget everything mirrored."""
+        with self._mirror_lock:
+            self._records = {}
+            self._missing = set()
+            self._fresh = {}
+            self._settings = {}
+            self._ends = None
+            self._generation += 1
+
+    def fingerprint(self):
+        """
+        Returns the MEM, RMB, SCT, SIH and SIT replies as a tuple.
+
+        This command is only acceptable in Programming Mode.
+        """
+        results = Interface.pipeline(self, [("MEM",), ("RMB",), ("SCT",), ("SIH",), ("SIT",)])
+
+        for res in results:
+            if isinstance(res, UnidenError):
+                raise res
+
+        return tuple(tuple(res) for res in results)
+
+    ########################################################################
+    ##  Lookups and updates
+    ########################################################################
+
+    def __lookup(self, cmd, args):
+        """
+        Returns the mirrored reply to a command, the UnidenValueError the
+        scanner answered it with, or None if it has to be sent.
+        """
+        if cmd in SETTING_COMMANDS and not args:
+            res = self._settings.get(cmd)
+        elif cmd in RECORD_COMMANDS and len(args) == 1:
+            if (cmd, _key(args[0])) in self._missing:
+                return UnidenValueError()
+
+            res = self._records.get((cmd, _key(args[0])))
+        elif cmd in ("SIH", "SIT") and not args and self._ends is not None:
+            res = [cmd, self._ends[cmd == "SIT" and 1 or 0]]
+        else:
+            return None
+
+        return res is not None and list(res) or None
+
+    def __record(self, cmd, idx):
+        return self._records.get((cmd, _key(idx)))
+
+    def __observe(self, cmd, args, res, generation):
+        """Bring the mirror up to date with a command that succeeded."""
+        if cmd in SETTING_COMMANDS:
+            if not args:
+                if generation == self._generation:
+                    self._settings[cmd] = list(res)
+            elif res[1] == "OK":
+                self._settings[cmd] = [cmd] + [_wire(v) for v in args]
+
+            return
+
+        if cmd in RECORD_COMMANDS:
+            if len(args) == 1:
+                if generation == self._generation:
+                    self._records[cmd, _key(args[0])] = list(res)
+            elif res[1] == "OK":
+                self.__set(cmd, args)
+
+            return
+
+        if _is_idempotent(cmd, args) or cmd in NEUTRAL_COMMANDS:
+            return
+
+        self._generation += 1
+        self._dirty = True
+
+        if cmd in APPENDS and res[1] != "-1":
+            self.__append(cmd, args[0], res[1])
+        elif cmd in DELETES and res[1] == "OK":
+            self.__delete(DELETES[cmd], args[0])
+        else:
+            self.invalidate()
+
+    def __refused(self, cmd, args, generation):
+        """Remember that there is no record of that kind at that index."""
+        if cmd in RECORD_COMMANDS and len(args) == 1 and generation == self._generation:
+            self._missing.add((cmd, _key(args[0])))
+
+    def __set(self, cmd, args):
+        idx = _key(args[0])
+        values = [_wire(v) for v in args[1:]]
+        start = FIELDS[cmd]
+
+        raw = self._records.get((cmd, idx))
+
+        if raw is None:
+            raw = self._fresh.pop((cmd, idx), None)
+
+            if raw is None:
+                return
+
+        raw[start:start + len(values)] = values
+
+        if None not in raw:
+            self._records[cmd, idx] = raw
+
+        self._generation += 1
+
+    def __append(self, cmd, parent, new):
+        """
+        cmd appended a record (to parent, unless it is a system): link it in
+        and remember its links until set_*_info() tells us the rest.
+        """
+        kind = APPENDS[cmd]
+        self._missing.discard((kind, _key(new)))
+
+        if kind == "SIN":
+            if self._ends is None:
+                # The old tail is whichever mirrored system had no forward
+                # link, and now it has one.
+                for key in [k for k, raw in self._records.items() if k[0] == "SIN" and
+                        raw[LINKS["SIN"][1]] == "-1"]:
+                    del self._records[key]
+
+                return
+
+            tail = self._ends[1]
+            self._ends = [self._ends[0] == "-1" and new or self._ends[0], new]
+            template = ["SIN", parent] + [None] * 8 + [tail, "-1", "-1", "-1", None]
+        else:
+            parent_kind, _ = PARENT[kind]
+            _, head_at, tail_at = CHILDREN[parent_kind]
+            p = self.__record(parent_kind, parent)
+
+            if p is None:
+                # Some mirrored sibling is the old tail, and its forward link
+                # just changed.
+                for key in [k for k, raw in self._records.items() if k[0] == kind and
+                        raw[PARENT[kind][1]] == str(_key(parent))]:
+                    del self._records[key]
+
+                return
+
+            tail = p[tail_at]
+            p[tail_at] = new
+
+            if p[head_at] == "-1":
+                p[head_at] = new
+
+            if kind == "GIN":
+                template = ["GIN", cmd == "AGC" and "C" or "T", None, None, None, tail, "-1",
+                    str(_key(parent)), "-1", "-1", None]
+            else:
+                template = ["CIN"] + [None] * 10 + [tail, "-1", p[7], str(_key(parent))]
+
+        previous = self.__record(kind, tail)
+
+        if previous is not None:
+            previous[LINKS[kind][1]] = new
+
+        if kind in SEQUENCE:
+            if tail == "-1":
+                template[SEQUENCE[kind]] = "1"
+            elif previous is not None:
+                template[SEQUENCE[kind]] = str(int(previous[SEQUENCE[kind]]) + 1)
+            else:
+                return
+
+        self._fresh[kind, _key(new)] = template
+
+    def __delete(self, kind, idx):
+        raw = self._records.pop((kind, _key(idx)), None)
+
+        if raw is None:
+            self.invalidate()
+            return
+
+        rev_at, fwd_at = LINKS[kind]
+        rev, fwd = raw[rev_at], raw[fwd_at]
+
+        previous, following = self.__record(kind, rev), self.__record(kind, fwd)
+
+        if previous is not None:
+            previous[fwd_at] = fwd
+
+        if following is not None:
+            following[rev_at] = rev
+
+        if kind == "SIN":
+            ends = self._ends
+        else:
+            parent_kind, parent_at = PARENT[kind]
+            _, head_at, tail_at = CHILDREN[parent_kind]
+            p = self.__record(parent_kind, raw[parent_at])
+            ends = p is not None and [p[head_at], p[tail_at]] or None
+
+        if ends is not None:
+            if ends[0] == str(_key(idx)):
+                ends[0] = fwd
+
+            if ends[1] == str(_key(idx)):
+                ends[1] = rev
+
+            if kind != "SIN":
+                p[head_at], p[tail_at] = ends
+
+        if kind in SEQUENCE:
+            seq_at = SEQUENCE[kind]
+
+            for key, other in list(self._records.items()) + list(self._fresh.items()):
+                if key[0] == kind and (kind == "SIN" or other[7] == raw[7]) and \
+                        other[seq_at] is not None and int(other[seq_at]) > int(raw[seq_at]):
+                    other[seq_at] = str(int(other[seq_at]) - 1)
+
+        # Whatever was in the deleted record goes with it.
+        if kind != "CIN":
+            owner_at = {"SIN": {"GIN": 7, "CIN": 13}, "GIN": {"CIN": 14}}[kind]
+
+            for key in list(self._records):
+                if key[0] in owner_at and self._records[key][owner_at[key[0]]] == str(_key(idx)):
+                    del self._records[key]
+
+    ########################################################################
+    ##  Interface
+    ########################################################################
+
+    def _send(self, cmd, *args):
+        with self._mirror_lock:
+            res = self.__lookup(cmd, args)
+            generation = self._generation
+
+        if isinstance(res, UnidenError):
+            raise res
+
+        if res is not None:
+            return res
+
+        if cmd == "EPG":
+            self.__leaving()
+
+        try:
+            res = Interface._send(self, cmd, *args)
+        except UnidenValueError:
+            with self._mirror_lock:
+                self.__refused(cmd, args, generation)
+
+            raise
+
+        with self._mirror_lock:
+            self.__observe(cmd, args, res, generation)
+
+        if cmd == "PRG":
+            self.__entered()
+
+        return res
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        commands = list(commands)
+        results = [None] * len(commands)
+        misses = []
+
+        with self._mirror_lock:
+            generation = self._generation
+
+            for n, command in enumerate(commands):
+                results[n] = self.__lookup(command[0], command[1:])
+
+                if results[n] is None:
+                    misses.append(n)
+
+        fetched = Interface.pipeline(self, [commands[n] for n in misses], window)
+
+        with self._mirror_lock:
+            for n, res in zip(misses, fetched):
+                results[n] = res
+
+                if isinstance(res, UnidenValueError):
+                    self.__refused(commands[n][0], commands[n][1:], generation)
+                elif not isinstance(res, UnidenError):
+                    self.__observe(commands[n][0], commands[n][1:], res, generation)
+
+        return results
+
+    def __entered(self):
+        try:
+            fingerprint = self.fingerprint()
+        except UnidenError:
+            self.invalidate()
+            return
+
+        with self._mirror_lock:
+            if self._dirty or fingerprint != self._fingerprint:
+                self.invalidate()
+
+            self._settings = {}
+            self._fingerprint = fingerprint
+            self._ends = [fingerprint[3][1], fingerprint[4][1]]
+            self._dirty = False
+
+    def __leaving(self):
+        if not self._dirty:
+            return
+
+        try:
+            fingerprint = self.fingerprint()
+        except UnidenError:
+            return
+
+        with self._mirror_lock:
+            self._fingerprint = fingerprint
+            self._dirty = False
@@ -0,0 +1,136 @@
+import time
+
+from . import UnidenError, UnidenUnexpectedResponseError
+
+# Defaults for AdaptiveInterval, in seconds.
+POLL_FLOOR = 0.1
+POLL_CEILING = 1.0
+POLL_HOLD = 2.0
+
+# How often ProgramModeSampler takes a reading, in seconds.
+SAMPLE_EVERY = 60.0
+
+# How many more times ProgramModeSampler sends EPG if the one sent with a
+# reading doesn't go through.
+EXIT_ATTEMPTS = 3
+
+
+class AdaptiveInterval:
+    """
+    How long to wait between get_status() polls.
+
+    While the scanner is receiving (squelch open) or its display is changing,
+    polls come every floor seconds, and keep doing so for hold seconds after
+    the last sign of activity, since transmissions tend to come in bursts.
+    After that the interval grows by growth each poll until it reaches
+    ceiling, so an idle scanner costs a few polls a second rather than ten.
+    The first open squelch or changed line drops it straight back to floor.
+    """
+    def __init__(self, floor=POLL_FLOOR, ceiling=POLL_CEILING, hold=POLL_HOLD, growth=1.5):
+        if floor < 0 or ceiling < floor:
+            raise ValueError
+
+        self.floor = floor
+        self.ceiling = ceiling
+        self.hold = hold
+        self.growth = growth
+        self.interval = floor
+        self.lines = None
+        self.active = None
+
+    def update(self, status, now=None):
+        """
+        Takes the latest get_status() reply and returns the number of seconds
+        to wait before the next poll.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        lines = (status["line1"], status["line2"])
+
+        if not status["squelch"] or lines != self.lines:
+            self.active = now
+
+        self.lines = lines
+
+        if self.active is not None and now - self.active < self.hold:
+            self.interval = self.floor
+        else:
+            self.interval = min((self.interval or 0.01) * self.growth, self.ceiling)
+
+        return self.interval
+
+
+class ProgramModeSampler:
+    """
+    Keeps recent readings of the used memory (MEM) and battery voltage (BAV),
+    which can only be read in Program Mode.
+
+    Hand it each get_status() reply with update().  Every every seconds, the
+    next time the squelch is closed, it enters Program Mode, reads both and
+    leaves again in one pipeline, so the scanner is out of scan mode for
+    about one round trip rather than four, and never while it is receiving.
+    used_memory (a percentage) and battery_voltage (raw, 0-255) are None
+    until the first reading succeeds; sampled_at is when it was taken, in
+    time.time() seconds.
+
+    If leaving Program Mode fails, it is tried again up to EXIT_ATTEMPTS
+    times and then the error is raised, rather than leaving the scanner out
+    of scan mode.
+    """
+    def __init__(self, i, every=SAMPLE_EVERY):
+        self.i = i
+        self.every = every
+        self.used_memory = None
+        self.battery_voltage = None
+        self.sampled_at = None
+        self.attempted = None
+
+    def due(self, now=None):
+        if now is None:
+            now = time.monotonic()
+
+        return self.attempted is None or now - self.attempted >= self.every
+
+    def update(self, status, now=None):
+        """
+        Takes a reading if one is due and the scanner isn't receiving.
+        Returns whether it did.
+        """
+        if not status["squelch"] or not self.due(now):
+            return False
+
+        self.sample(now)
+        return True
+
+    def sample(self, now=None):
+        """Take a reading now.  A failed one leaves the last one in place."""
+        self.attempted = now is None and time.monotonic() or now
+
+        results = self.i.pipeline([("PRG",), ("MEM",), ("BAV",), ("EPG",)])
+        prg, mem, bav, epg = results
+
+        if isinstance(epg, UnidenError) or epg != ["EPG", "OK"]:
+            self.__leave()
+
+        if any(isinstance(res, UnidenError) for res in results[:3]):
+            return
+
+        if prg[0] != "PRG" or mem[0] != "MEM" or bav[0] != "BAV":
+            return
+
+        self.used_memory = int(mem[1])
+        self.battery_voltage = int(bav[1])
+        self.sampled_at = time.time()
+
+    def __leave(self):
+        error = UnidenUnexpectedResponseError()
+
+        for attempt in range(EXIT_ATTEMPTS):
+            try:
+                if self.i.exit_program_mode():
+                    return
+            except UnidenError as e:
+                error = e
+
+        raise error
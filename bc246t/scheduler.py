@@ -0,0 +1,142 @@
+import itertools
+import threading
+import time
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITY__VALUES = (PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK)
+
+# Commands someone is usually waiting on, and commands that usually come in
+# long runs.  Anything else is PRIORITY_NORMAL.
+INTERACTIVE_COMMANDS = ("KEY", "STS", "GID", "WIN", "POF")
+BULK_COMMANDS = ("SIN", "GIN", "CIN", "TIN", "TFQ", "CSY", "DSY", "CPS", "AGC", "AGI",
+    "ACC", "ACT", "DGR", "DCH", "FWD", "REV")
+
+
+def command_priority(cmd):
+    """Returns the default priority class for the named command."""
+    if cmd in INTERACTIVE_COMMANDS:
+        return PRIORITY_INTERACTIVE
+
+    if cmd in BULK_COMMANDS:
+        return PRIORITY_BULK
+
+    return PRIORITY_NORMAL
+
+
+class Turn:
+    """
+    One caller's claim on the serial port; use it as a context manager.
+
+    While held, contended() tells whether a caller of a more urgent class is
+    waiting, and yield_() steps aside to let it (and anyone else more urgent)
+    go first before taking the port back.
+    """
+    def __init__(self, scheduler, priority, deadline):
+        if priority not in PRIORITY__VALUES:
+            raise ValueError
+
+        self.scheduler = scheduler
+        self.priority = priority
+        self.deadline = deadline is not None and time.monotonic() + deadline or None
+        self.seq = None
+
+    def __enter__(self):
+        self.scheduler._acquire(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler._release()
+
+    def contended(self):
+        return self.scheduler._contended(self)
+
+    def yield_(self):
+        self.scheduler._release()
+        self.scheduler._acquire(self)
+
+
+class Unscheduled:
+    """Stands in for a Turn when an Interface has no scheduler."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def contended(self):
+        return False
+
+    def yield_(self):
+        pass
+
+
+class Scheduler:
+    """
+    Decides which of several callers sharing an Interface talks next.
+
+    Callers wait in three classes, PRIORITY_INTERACTIVE, PRIORITY_NORMAL and
+    PRIORITY_BULK; when the port comes free it goes to the most urgent class,
+    and within a class to the earliest deadline, then first come first served.
+    A waiter whose deadline has passed is treated as PRIORITY_INTERACTIVE so
+    bulk work can't be starved forever.
+
+    Since every command takes its own turn, a keypress never waits for more
+    than what is already on the wire--one command, or at most a window's worth
+    for Interface.pipeline()--plus anything promoted past its deadline,
+    however many bulk reads are queued.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.holder = None
+        self.counter = itertools.count()
+
+    def turn(self, priority=PRIORITY_NORMAL, deadline=None):
+        """
+        Returns a Turn for the given class.  deadline, if given, is how many
+        seconds from now the caller is prepared to wait.
+        """
+        return Turn(self, priority, deadline)
+
+    def __rank(self, turn, now):
+        if turn.deadline is not None and now >= turn.deadline:
+            cls = PRIORITY_INTERACTIVE
+        else:
+            cls = turn.priority
+
+        return (cls, turn.deadline is None and float("inf") or turn.deadline, turn.seq)
+
+    def _acquire(self, turn):
+        with self.cond:
+            turn.seq = next(self.counter)
+
+            if self.holder is None and not self.waiting:
+                self.holder = turn
+                return
+
+            self.waiting.append(turn)
+
+            while self.holder is not turn:
+                self.cond.wait()
+
+    def _release(self):
+        with self.cond:
+            if not self.waiting:
+                self.holder = None
+                return
+
+            now = time.monotonic()
+            winner = min(self.waiting, key=lambda t: self.__rank(t, now))
+            self.waiting.remove(winner)
+            self.holder = winner
+            self.cond.notify_all()
+
+    def _contended(self, turn):
+        with self.cond:
+            now = time.monotonic()
+            mine = self.__rank(turn, now)[0]
+
+            return any(self.__rank(t, now)[0] < mine for t in self.waiting)
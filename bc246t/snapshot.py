@@ -0,0 +1,243 @@
+import copy
+import json
+import os
+import re
+
+from . import PIPELINE_WINDOW, UnidenError
+from .tree import iter_tree
+
+SNAPSHOT_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+    os.path.join(os.path.expanduser('~'), '.cache'), 'bc246t')
+
+# Commands whose replies make up the memory fingerprint.
+FINGERPRINT_COMMANDS = ("MEM", "RMB", "SCT", "SIH", "SIT")
+
+
+def default_path(i, model, firmware):
+    """
+    Returns where to keep the snapshot of the scanner on i's port, so that
+    several scanners don't share one.
+    """
+    port = getattr(i.device, 'port', None) or 'scanner'
+    name = re.sub(r'[^A-Za-z0-9.]+', '_', '%s-%s-%s' % (model, firmware, port)).strip('_')
+
+    return os.path.join(SNAPSHOT_DIR, name + '.json')
+
+
+def fingerprint(i):
+    """
+    Returns the MEM, RMB, SCT, SIH and SIT replies: the used and free memory,
+    the number of systems and the ends of the system list.  Any record being
+    added or deleted changes it; editing one in place does not, which is why
+    CachedTree reads every record again unless it is told to trust it.
+
+    This command is only acceptable in Programming Mode.
+    """
+    results = i.pipeline([(cmd,) for cmd in FINGERPRINT_COMMANDS])
+
+    for res in results:
+        if isinstance(res, UnidenError):
+            raise res
+
+    return [res[1] for res in results]
+
+
+def load(path):
+    """Returns the snapshot saved at path, or None if there isn't a usable one."""
+    try:
+        return json.loads(open(path).read())
+    except (OSError, ValueError):
+        return None
+
+
+def save(path, snapshot):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    tmp = path + '.tmp'
+    open(tmp, 'w').write(json.dumps(snapshot))
+    os.replace(tmp, path)
+
+
+# The fields that link records into lists.  A record whose links are as the
+# snapshot has them is still where the snapshot put it.
+LINK_KEYS = ('reverse_index', 'forward_index', 'group_head_index', 'group_tail_index',
+    'system_index', 'channel_head_index', 'channel_tail_index', 'group_index')
+
+
+def _links(record):
+    return [record.get(k) for k in LINK_KEYS]
+
+
+def _check(cached, fresh):
+    """
+    Compare the records in cached (snapshot dicts) with fresh (what
+    get_*_infos() returned for them).  Returns the number that changed, with
+    their new fields copied into cached, or None if any failed to read or was
+    moved.
+    """
+    changed = 0
+
+    for record, res in zip(cached, fresh):
+        if isinstance(res, UnidenError) or _links(res) != _links(record):
+            return None
+
+        if any(record[k] != v for k, v in res.items()):
+            record.update(res)
+            changed += 1
+
+    return changed
+
+
+def _recheck(i, groups, window):
+    """
+    Read every channel the snapshot has for groups, in one pipeline.  Returns
+    (channels, changed): channels maps the index of each group whose channels
+    are all still linked the way they were to its list of channels, brought
+    up to date; changed is how many of those had been edited.
+    """
+    cached = [channel for group in groups.values() for channel in group['channels']]
+    results = iter(i.get_channel_infos([channel['index'] for channel in cached], window))
+    channels = {}
+    changed = 0
+
+    for idx, group in groups.items():
+        fresh = [next(results) for _ in group['channels']]
+        n = _check(group['channels'], fresh)
+
+        if n is not None:
+            channels[idx] = group['channels']
+            changed += n
+
+    return channels, changed
+
+
+class CachedTree:
+    """
+    iter_tree(), using a snapshot taken by an earlier run where it can.
+
+    Every record the snapshot holds is read again, all in one pipeline
+    rather than list by list, and any that was edited in place since is
+    brought up to date.  If the snapshot is of the same model and firmware,
+    the memory fingerprint hasn't changed and every record is still linked
+    where it was, nothing else is read.  Otherwise the systems and groups
+    are walked, and a group's channels are taken from the snapshot (as just
+    read) if the ends of its channel list are unchanged and each of its
+    channels still links to the same neighbours.
+
+    With trust, a snapshot whose fingerprint matches is taken as it is and
+    nothing is read at all.  Records edited in place since--a channel
+    renamed from the keypad, say--don't change the fingerprint, so those
+    edits are missed.
+
+    Iterating yields the systems as read_tree() returns them; from_tail is
+    passed on to iter_tree().  Once that is done, self.snapshot is the
+    snapshot to save for next time, self.read the number of records that
+    had to be walked, self.checked the number read again from the snapshot,
+    self.changed the number of those that had been edited and self.trusted
+    the number taken from the snapshot without reading them.
+
+    This command is only acceptable in Programming Mode.
+    """
+    def __init__(self, i, snapshot, model, firmware, window=PIPELINE_WINDOW, from_tail=True,
+            trust=False):
+        self.i = i
+        self.from_tail = from_tail
+        self.trust = trust
+        self.model = model
+        self.firmware = firmware
+        self.window = window
+        self.read = 0
+        self.checked = 0
+        self.changed = 0
+        self.trusted = 0
+        self.snapshot = None
+
+        if snapshot is not None and (snapshot.get('model'), snapshot.get('firmware')) != \
+                (model, firmware):
+            snapshot = None
+
+        self.previous = snapshot
+
+    def __iter__(self):
+        current = fingerprint(self.i)
+        previous = self.previous
+
+        if previous is not None and previous.get('fingerprint') == current:
+            systems = copy.deepcopy(previous['systems'])
+            groups = [group for system in systems for group in system['groups']]
+            channels = [channel for group in groups for channel in group['channels']]
+
+            if self.trust:
+                self.trusted = len(systems) + len(groups) + len(channels)
+                self.snapshot = previous
+
+                for system in systems:
+                    yield system
+
+                return
+
+            self.checked = len(systems) + len(groups) + len(channels)
+            changed = [_check(records, fetch([r['index'] for r in records], self.window))
+                for records, fetch in ((systems, self.i.get_system_infos),
+                    (groups, self.i.get_group_infos), (channels, self.i.get_channel_infos))]
+
+            if None not in changed:
+                self.changed = sum(changed)
+                self.snapshot = dict(previous, systems=copy.deepcopy(systems))
+
+                for system in systems:
+                    yield system
+
+                return
+
+        groups = {}
+
+        if previous is not None:
+            for system in copy.deepcopy(previous['systems']):
+                for group in system['groups']:
+                    groups[group['index']] = group
+
+        fresh, self.changed = _recheck(self.i, groups, self.window)
+        self.checked = sum(len(group['channels']) for group in groups.values())
+        reused = set()
+
+        def reuse(group):
+            cached = groups.get(group['index'])
+
+            if group['index'] in fresh and _links(cached) == _links(group):
+                reused.add(group['index'])
+                return copy.deepcopy(fresh[group['index']])
+
+        systems = []
+
+        for system in iter_tree(self.i, self.window, reuse, self.from_tail):
+            self.read += 1
+
+            for group in system['groups']:
+                self.read += 1
+
+                if group['index'] not in reused:
+                    self.read += len(group['channels'])
+
+            systems.append(copy.deepcopy(system))
+            yield system
+
+        self.snapshot = {
+            'model': self.model,
+            'firmware': self.firmware,
+            'fingerprint': current,
+            'systems': systems,
+        }
+
+
+def read_tree_cached(i, snapshot, model, firmware, window=PIPELINE_WINDOW):
+    """
+    read_tree() through a CachedTree.  Returns (systems, new snapshot,
+    number of records walked).
+
+    This command is only acceptable in Programming Mode.
+    """
+    tree = CachedTree(i, snapshot, model, firmware, window)
+    systems = list(tree)
+
+    return systems, tree.snapshot, tree.read
@@ -0,0 +1,156 @@
+import json
+import queue
+import re
+import threading
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# How much of the file to read at a time.
+CHUNK_SIZE = 65536
+
+
+class _Reader:
+    """
+    Just enough of a JSON tokenizer to walk a document's outer object and its
+    'systems' array, decoding each value with json once all of it has been
+    read.
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        data = self.f.read(max(size or 0, self.chunk_size))
+
+        if not data:
+            self.eof = True
+            return
+
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def error(self, message):
+        return ValueError('%s at offset %d' % (message, self.offset + self.pos))
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+
+            self.fill()
+
+    def expect(self, chars):
+        c = self.peek()
+
+        if c == '' or c not in chars:
+            raise self.error('Expected %s' % ' or '.join(repr(c) for c in chars))
+
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise self.error(e.msg)
+
+                # Not all there yet.  Read at least as much again as is
+                # buffered, so a big value isn't re-parsed once per chunk.
+                self.fill(len(self.buf) - self.pos)
+                continue
+
+            # A number running up to the end of the buffer may go on.
+            if end == len(self.buf) and not self.eof:
+                self.fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_document(f, chunk_size=CHUNK_SIZE):
+    """
+    Parse a document in import.py's format from the file f a piece at a
+    time, yielding (key, value) for each member of the outer object in the
+    order they appear--except that 'systems' is yielded as ('system', s)
+    for each system in it, as soon as that system has been read.
+
+    Raises ValueError if the file isn't JSON or isn't an object.
+    """
+    r = _Reader(f, chunk_size)
+    r.expect('{')
+
+    if r.peek() == '}':
+        return
+
+    while True:
+        key = r.value()
+
+        if not isinstance(key, str):
+            raise r.error('Expected a property name')
+
+        r.expect(':')
+
+        if key == 'systems' and r.peek() == '[':
+            r.expect('[')
+
+            if r.peek() == ']':
+                r.expect(']')
+            else:
+                while True:
+                    yield 'system', r.value()
+
+                    if r.expect(',]') == ']':
+                        break
+        else:
+            yield key, r.value()
+
+        if r.expect(',}') == '}':
+            break
+
+    if r.peek() != '':
+        raise r.error('Extra data')
+
+
+def iter_document_ahead(f, ahead=16, chunk_size=CHUNK_SIZE):
+    """
+    iter_document(), parsing in a background thread up to ahead items
+    before they are asked for, so that parsing overlaps whatever is done with
+    each item.
+    """
+    items = queue.Queue(maxsize=ahead)
+    done = object()
+
+    def parse():
+        try:
+            for item in iter_document(f, chunk_size):
+                items.put(item)
+        except BaseException as e:
+            items.put((done, e))
+        else:
+            items.put((done, None))
+
+    threading.Thread(target=parse, name='bc246t-parse', daemon=True).start()
+
+    while True:
+        item = items.get()
+
+        if item[0] is done:
+            if item[1] is not None:
+                raise item[1]
+
+            return
+
+        yield item
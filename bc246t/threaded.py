@@ -0,0 +1,93 @@
+import concurrent.futures
+import itertools
+import queue
+import threading
+
+from . import Interface, PIPELINE_WINDOW
+from .scheduler import command_priority, PRIORITY_BULK
+
+
+class ThreadedInterface(Interface):
+    """
+    An Interface that can be shared between threads.
+
+    A background I/O thread owns the device.  Every command is handed to it
+    through a priority queue (ordered like Scheduler: interactive, normal,
+    bulk, then arrival order) and the caller just waits for the reply, so no
+    lock is held across the round trip and callers never see each other's
+    bytes.
+
+    All the usual methods work and block as before; submit() and
+    submit_pipeline() return a concurrent.futures.Future instead:
+
+        i = ThreadedInterface("/dev/ttyUSB0")
+        f = i.submit("STS")
+        ...
+        cmd, *fields = f.result()
+
+    Call close() to stop the I/O thread.  Any other keyword arguments
+    (timeout, retries, backoff) are passed on to Interface.
+    """
+    def __init__(self, port="/dev/ttyS0", baudrate=57600, device=None, **kwargs):
+        Interface.__init__(self, port, baudrate, device, **kwargs)
+
+        self._jobs = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._worker = threading.Thread(target=self.__run, name="bc246t-io", daemon=True)
+        self._worker.start()
+
+    def __run(self):
+        while True:
+            _, _, future, fn, args = self._jobs.get()
+
+            if fn is None:
+                return
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def __submit(self, priority, fn, *args):
+        override = getattr(self._local, "priority", None)
+
+        if override is not None:
+            priority = override[0]
+
+        future = concurrent.futures.Future()
+        self._jobs.put((priority, next(self._counter), future, fn, args))
+
+        return future
+
+    def close(self):
+        """Stop the I/O thread once the commands already queued are done."""
+        self._jobs.put((float("inf"), next(self._counter), None, None, ()))
+        self._worker.join()
+        self.device.close()
+
+    def submit(self, cmd, *args):
+        """
+        Queue a command and return a Future for its split reply, as _send()
+        would return it (or the UnidenError it raised).  It is sent through
+        _send(), so it is checked and retried the same way.
+        """
+        return self.__submit(command_priority(cmd), Interface._send, self, cmd, *args)
+
+    def submit_pipeline(self, commands, window=PIPELINE_WINDOW):
+        """Queue a pipeline() and return a Future for its result list."""
+        return self.__submit(PRIORITY_BULK, Interface.pipeline, self, list(commands), window)
+
+    def _transact(self, buf):
+        # A submit()ted command is already on the I/O thread.
+        if threading.current_thread() is self._worker:
+            return Interface._transact(self, buf)
+
+        cmd = buf.split(",", 1)[0]
+
+        return self.__submit(command_priority(cmd), Interface._transact, self, buf).result()
+
+    def pipeline(self, commands, window=PIPELINE_WINDOW):
+        return self.submit_pipeline(commands, window).result()
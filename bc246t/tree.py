@@ -0,0 +1,299 @@
+from . import PIPELINE_WINDOW, UnidenError, UnidenUnexpectedResponseError, \
+    _decode_system_info, _decode_group_info, _decode_channel_info
+
+DECODERS = {
+    "SIN": _decode_system_info,
+    "GIN": _decode_group_info,
+    "CIN": _decode_channel_info,
+}
+
+# The most channels read ahead of a chain in one wave.  See _Chain.
+MAX_READ_AHEAD = 32
+
+
+def _chain(head):
+    return head is not None and head != -1 and head or None
+
+
+class _Chain:
+    """
+    One linked list being read: the systems, a system's groups or a group's
+    channels.
+
+    The list is walked from both ends at once, forwards from the head and
+    backwards from the tail, until the two meet.  Channel lists are also read
+    ahead: the scanner hands out indices in order, so the channels of a group
+    that was programmed in one go usually sit at head, head + 1, ... tail.  The
+    read-ahead starts at the whole window and doubles while the guesses keep
+    paying off; the first miss drops it to nothing.
+    """
+    def __init__(self, cmd, head, tail, window, from_tail=True):
+        self.cmd = cmd
+        self.front = _chain(head)
+        self.tail = _chain(tail)
+        self.back = from_tail and self.tail or None
+        self.ahead = cmd == "CIN" and window - 1 or 0
+        self.guessed = 0
+        self.seen = set()
+        self.forward = []
+        self.backward = []
+
+    @property
+    def done(self):
+        return self.front is None and self.back is None
+
+    @property
+    def records(self):
+        return self.forward + self.backward[::-1]
+
+    def wanted(self):
+        """Returns the indices this chain would like read next."""
+        wanted = []
+        self.guessed = 0
+
+        if self.front is not None:
+            wanted.append(self.front)
+
+            if self.tail is not None and self.front < self.tail:
+                last = min(self.front + self.ahead, self.tail)
+                wanted.extend(range(self.front + 1, last + 1))
+                self.guessed = max(0, last - self.front)
+
+        if self.back is not None:
+            wanted.append(self.back)
+
+        return wanted
+
+    def __met(self):
+        if self.front in self.seen or self.back in self.seen:
+            self.front = self.back = None
+
+    def advance(self, cache):
+        """
+        Consume whatever cached records continue the chain.  Returns the
+        records consumed.
+        """
+        consumed = []
+
+        while self.front is not None and self.front in cache and self.front not in self.seen:
+            record = cache[self.front]
+            record['index'] = self.front
+            self.seen.add(self.front)
+            self.forward.append(record)
+            consumed.append(record)
+            self.front = record['forward_index']
+
+        hits = len(consumed) - 1
+        self.__met()
+
+        while self.back is not None and self.back in cache and self.back not in self.seen:
+            record = cache[self.back]
+            record['index'] = self.back
+            self.seen.add(self.back)
+            self.backward.append(record)
+            consumed.append(record)
+            self.back = record['reverse_index']
+
+        self.__met()
+
+        if self.ahead:
+            self.ahead = hits >= self.guessed and min(self.ahead * 2, MAX_READ_AHEAD) or 0
+
+        return consumed
+
+
+def read_settings(i):
+    """
+    Returns the scanner's settings in export.py's format.
+
+    This command is only acceptable in Programming Mode.
+    """
+    return {
+        'backlight': i.get_backlight(),
+        'battery_save': i.get_battery_savings_mode(),
+        'key_beep': i.get_key_beep(),
+        'greeting': i.get_greeting(),
+        'priority_mode': i.get_priority_mode(),
+    }
+
+
+def _complete(system):
+    """
+    If everything under system has been read, replace its chains with lists
+    and return True.
+    """
+    if isinstance(system['groups'], _Chain):
+        if not system['groups'].done:
+            return False
+
+        for group in system['groups'].records:
+            if isinstance(group['channels'], _Chain) and not group['channels'].done:
+                return False
+
+        system['groups'] = system['groups'].records
+
+        for group in system['groups']:
+            if isinstance(group['channels'], _Chain):
+                group['channels'] = group['channels'].records
+
+    return True
+
+
+def _wave(i, chains, cache, window):
+    """
+    Read, in one pipeline, the records every chain wants next that aren't
+    already in cache, and advance the chains.  Returns a (chain, records
+    consumed) pair for each chain.
+    """
+    requests = []
+    asked = set()
+
+    for chain in chains:
+        for idx in chain.wanted():
+            if idx not in cache[chain.cmd] and (chain.cmd, idx) not in asked:
+                asked.add((chain.cmd, idx))
+                requests.append((chain.cmd, idx))
+
+    errors = {}
+
+    for (cmd, idx), res in zip(requests, i.pipeline(requests, window)):
+        if not isinstance(res, UnidenError):
+            try:
+                res = DECODERS[cmd](res)
+            except (UnidenError, ValueError):
+                res = UnidenUnexpectedResponseError()
+
+        if isinstance(res, UnidenError):
+            errors[cmd, idx] = res
+        else:
+            cache[cmd][idx] = res
+
+    for chain in chains:
+        for idx in (chain.front, chain.back):
+            if (chain.cmd, idx) in errors:
+                raise errors[chain.cmd, idx]
+
+    return [(chain, chain.advance(cache[chain.cmd])) for chain in chains]
+
+
+def _read_chains(i, chains, window):
+    cache = {cmd: {} for cmd in DECODERS}
+
+    while chains:
+        _wave(i, chains, cache, window)
+        chains = [c for c in chains if not c.done]
+
+
+def read_system(i, idx, channels=(), window=PIPELINE_WINDOW):
+    """
+    Returns the system at idx as read_tree() would, except that only the
+    channels of the groups at the positions (counting from 0) in channels
+    are read; every other group's 'channels' is None.
+
+    This command is only acceptable in Programming Mode.
+    """
+    system = i.get_system_info(idx)
+    system['index'] = idx
+
+    groups = _Chain("GIN", system['group_head_index'], system['group_tail_index'], window)
+    _read_chains(i, [groups], window)
+    system['groups'] = groups.records
+
+    chains = []
+
+    for n, group in enumerate(system['groups']):
+        group['channels'] = None
+
+        if n in channels:
+            group['channels'] = _Chain("CIN", group['channel_head_index'],
+                group['channel_tail_index'], window)
+            chains.append(group['channels'])
+
+    _read_chains(i, chains, window)
+
+    for group in system['groups']:
+        if group['channels'] is not None:
+            group['channels'] = group['channels'].records
+
+    return system
+
+
+def read_tree(i, window=PIPELINE_WINDOW, reuse=None):
+    """
+    Returns every system on the scanner, in order, as the dicts
+    get_system_info() returns with two keys added: 'index', the system's
+    index, and 'groups', a list of its groups.  Each group is likewise a
+    get_group_info() dict with 'index' and 'channels', and each channel a
+    get_channel_info() dict with 'index'.
+
+    Rather than following forward_index one round trip at a time, the lists
+    are read in waves with Interface.pipeline(): each wave asks for the next
+    record of every list still being walked--all the systems' group lists and
+    all the groups' channel lists at once--from both ends of each list, plus
+    any channels read ahead (see _Chain).  Guesses that turn out wrong cost a
+    command each and are otherwise ignored; a failure reading a record that
+    is actually in a list raises its UnidenError as get_*_info() would.
+
+    If reuse is given, it is called with each group as it is read (before
+    'channels' is added) and may return a list of channels to use instead of
+    reading them.
+
+    This command is only acceptable in Programming Mode.
+    """
+    return list(iter_tree(i, window, reuse))
+
+
+def iter_tree(i, window=PIPELINE_WINDOW, reuse=None, from_tail=True):
+    """
+    read_tree(), yielding each system as soon as it and everything under it
+    has been read, rather than once everything has been.
+
+    Systems read from the tail end of the list can't be yielded until the
+    two ends meet, so with from_tail=False the system list is only read from
+    the head: the first systems arrive sooner and the rest arrive steadily,
+    for about the same total time.
+
+    This command is only acceptable in Programming Mode.
+    """
+    head, tail = i.pipeline([("SIH",), ("SIT",)], window)
+
+    for res in (head, tail):
+        if isinstance(res, UnidenError):
+            raise res
+
+    systems = _Chain("SIN", int(head[1]), int(tail[1]), window, from_tail)
+    chains = [systems]
+    cache = {cmd: {} for cmd in DECODERS}
+    done = 0
+
+    while chains:
+        spawned = []
+
+        for chain, consumed in _wave(i, chains, cache, window):
+            for record in consumed:
+                if chain.cmd == "SIN":
+                    record['groups'] = _Chain("GIN", record['group_head_index'],
+                        record['group_tail_index'], window)
+                    spawned.append(record['groups'])
+                elif chain.cmd == "GIN":
+                    channels = reuse is not None and reuse(record) or None
+
+                    if channels is not None:
+                        record['channels'] = channels
+                        continue
+
+                    record['channels'] = _Chain("CIN", record['channel_head_index'],
+                        record['channel_tail_index'], window)
+                    spawned.append(record['channels'])
+
+        chains = [c for c in chains + spawned if not c.done]
+
+        # Systems read from the head can go as soon as they are complete;
+        # those read from the tail have to wait for the two ends to meet.
+        while done < len(systems.forward) and _complete(systems.forward[done]):
+            yield systems.forward[done]
+            done += 1
+
+    for system in systems.records[done:]:
+        _complete(system)
+        yield system
@@ -0,0 +1,220 @@
+import bisect
+
+import jsonschema
+
+# Python types for each JSON type.  bool is an int to Python but not a number
+# to JSON Schema, so it is checked separately.
+TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'boolean': bool,
+    'null': type(None),
+}
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and v.__class__ is not bool
+
+
+def _is_integer(v):
+    return _is_number(v) and (isinstance(v, int) or v.is_integer())
+
+
+def _type_check(name):
+    if name == 'number':
+        return _is_number
+
+    if name == 'integer':
+        return _is_integer
+
+    t = TYPES[name]
+    return lambda v: isinstance(v, t)
+
+
+def _equal(a, b):
+    if (a.__class__ is bool) != (b.__class__ is bool):
+        return False
+
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+
+    return a == b
+
+
+def _bands(alternatives):
+    """
+    If every alternative of a oneOf is only a closed numeric range and no two
+    overlap, returns the ranges sorted, else None.
+    """
+    bands = []
+
+    for s in alternatives:
+        if set(s) != {'minimum', 'maximum'}:
+            return None
+
+        bands.append((s['minimum'], s['maximum']))
+
+    bands.sort()
+
+    for (_, hi), (lo, _) in zip(bands, bands[1:]):
+        if lo <= hi:
+            return None
+
+    return bands
+
+
+def _compile(schema):
+    """
+    Returns a function taking an instance and returning whether it is valid
+    against schema, built from checks for just the keywords schema uses.
+
+    Raises NotImplementedError for keywords it doesn't know.
+    """
+    checks = []
+
+    for keyword, value in schema.items():
+        checks.extend(_keyword(keyword, value, schema))
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(v):
+        for check in checks:
+            if not check(v):
+                return False
+
+        return True
+
+    return check_all
+
+
+def _keyword(keyword, value, schema):
+    if keyword == 'type':
+        if not isinstance(value, list):
+            return [_type_check(value)]
+
+        types = [_type_check(name) for name in value]
+        return [lambda v: any(t(v) for t in types)]
+
+    if keyword == 'enum':
+        return [lambda v: any(_equal(v, e) for e in value)]
+
+    if keyword == 'const':
+        return [lambda v: _equal(v, value)]
+
+    if keyword == 'required':
+        return [lambda v: not isinstance(v, dict) or all(k in v for k in value)]
+
+    if keyword == 'requried':
+        # A typo in bc246t.schema; jsonschema ignores unknown keywords too.
+        return []
+
+    if keyword == 'properties':
+        properties = {k: _compile(s) for k, s in value.items()}
+
+        def check(v):
+            if not isinstance(v, dict):
+                return True
+
+            for k, item in v.items():
+                p = properties.get(k)
+
+                if p is not None and not p(item):
+                    return False
+
+            return True
+
+        return [check]
+
+    if keyword == 'additionalProperties':
+        if value is not False:
+            raise NotImplementedError(keyword)
+
+        known = set(schema.get('properties', {}))
+        return [lambda v: not isinstance(v, dict) or known.issuperset(v)]
+
+    if keyword == 'items':
+        item = _compile(value)
+        return [lambda v: not isinstance(v, list) or all(item(x) for x in v)]
+
+    if keyword == 'minItems':
+        return [lambda v: not isinstance(v, list) or len(v) >= value]
+
+    if keyword == 'maxItems':
+        return [lambda v: not isinstance(v, list) or len(v) <= value]
+
+    if keyword == 'maxLength':
+        return [lambda v: not isinstance(v, str) or len(v) <= value]
+
+    if keyword == 'minimum':
+        return [lambda v: not _is_number(v) or v >= value]
+
+    if keyword == 'maximum':
+        return [lambda v: not _is_number(v) or v <= value]
+
+    if keyword == 'multipleOf':
+        if isinstance(value, float):
+            return [lambda v: not _is_number(v) or (v / value).is_integer()]
+
+        return [lambda v: not _is_number(v) or v % value == 0]
+
+    if keyword == 'oneOf':
+        bands = _bands(value)
+
+        if bands is not None:
+            # Non-numbers satisfy every range, so never exactly one.
+            lows = [lo for lo, _ in bands]
+
+            def check(v):
+                if not _is_number(v):
+                    return len(bands) == 1
+
+                n = bisect.bisect_right(lows, v) - 1
+                return n >= 0 and v <= bands[n][1]
+
+            return [check]
+
+        alternatives = [_compile(s) for s in value]
+        return [lambda v: sum(1 for a in alternatives if a(v)) == 1]
+
+    raise NotImplementedError(keyword)
+
+
+_compiled = {}
+
+
+def compile_schema(schema):
+    """
+    Returns a function taking an instance and returning whether it is valid
+    against schema.  Compiled functions are cached per schema object.
+    Schemas using keywords this module doesn't know get jsonschema's
+    is_valid() instead.
+    """
+    fn = _compiled.get(id(schema))
+
+    if fn is None or fn[0] is not schema:
+        try:
+            is_valid = _compile(schema)
+        except NotImplementedError:
+            is_valid = jsonschema.validators.validator_for(schema)(schema).is_valid
+
+        fn = _compiled[id(schema)] = (schema, is_valid)
+
+    return fn[1]
+
+
+def validate(instance, schema):
+    """
+    A faster jsonschema.validate(), for bc246t.schema and its parts.
+
+    Valid instances are accepted by a validator compiled once per schema,
+    with the frequency bands checked by a binary search rather than a
+    oneOf.  Anything it rejects is handed to jsonschema.validate() so the
+    ValidationError raised is exactly the one jsonschema would raise (its
+    json_path says where in the document the problem is).
+    """
+    if compile_schema(schema)(instance):
+        return
+
+    jsonschema.validate(instance=instance, schema=schema)
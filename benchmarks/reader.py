@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# Micro-benchmark for the response reader in bc246t.Interface.
+#
+# Runs get_channel_info() against an in-memory fake serial device, first with
+# the old byte-at-a-time reader and then with the buffered one, and reports the
+# CPU time spent per command.
+#
+#   usage: python benchmarks/reader.py [iterations]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import bc246t
+
+REPLY = b"CIN,Police Dispatch,01550000,0,NFM,0,0,0,0,0,0,-1,2,1,1\r"
+
+
+class FakeDevice:
+    """Just enough of serial.Serial to answer every command with REPLY."""
+
+    def __init__(self):
+        self.pending = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.pending)
+
+    def write(self, data):
+        self.pending += REPLY
+        return len(data)
+
+    def read(self, size=1):
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        return data
+
+
+def legacy_readline(self, timeout=None):
+    # The reader as it was before buffering: one read(), decode() and string
+    # copy per byte.
+    buf = ""
+
+    while len(buf) == 0 or buf[-1] != "\r":
+        recv = self.device.read(1).decode()
+
+        if len(recv) == 0:
+            raise Exception("timeout!")
+
+        buf += recv
+
+    return buf.rstrip("\r")
+
+
+def run(iterations):
+    i = bc246t.Interface(device=FakeDevice())
+
+    start = time.process_time()
+    for _ in range(iterations):
+        i.get_channel_info(1)
+
+    return (time.process_time() - start) / iterations
+
+
+def main(iterations):
+    buffered = bc246t.Interface._Interface__readline
+
+    bc246t.Interface._Interface__readline = legacy_readline
+    try:
+        before = run(iterations)
+    finally:
+        bc246t.Interface._Interface__readline = buffered
+
+    after = run(iterations)
+
+    print("reply size:  %d bytes" % len(REPLY))
+    print("iterations:  %d" % iterations)
+    print("")
+    print("before:      %7.2f us/command" % (before * 1e6))
+    print("after:       %7.2f us/command" % (after * 1e6))
+    print("speedup:     %7.2fx" % (before / after))
+
+
+if __name__ == '__main__':
+    main(len(sys.argv) > 1 and int(sys.argv[1]) or 20000)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#
+# Throughput benchmarks for export.py, import.py and the status.py poll loop.
+#
+# Each scenario runs the real script against bc246t.emulator, programmed with a
+# synthetic library of the given size, and reports:
+#
+#   commands/sec, bytes on the wire, wall time, CPU time of the calling thread,
+#   and p50/p99 per-command latency.
+#
+# By default the emulator models the wire time of a 57600 baud link, so the
+# numbers are comparable with the real scanner; --baudrate 0 turns that off to
+# look at CPU cost alone.  --turnaround adds a delay to every reply on its way
+# back, as a USB serial adapter does (often 1-16ms), which is what pipelining
+# hides.
+#
+#   usage: python benchmarks/throughput.py [--sizes tiny,small] [--baudrate N]
+#              [--turnaround SECONDS] [--runs 3] [--save FILE] [--compare FILE]
+#              [--tolerance 0.25]
+#
+# Each size is run --runs times and every number reported is the median of
+# those runs, so one slow run (a busy machine, a GC pause) doesn't show up
+# as a regression.
+#
+# --save writes the results as a JSON baseline; --compare checks them against a
+# saved baseline and exits with status 1 if any wall time, CPU time or p99
+# latency got worse by more than the tolerance.  A change that moves these
+# numbers on purpose (e.g. sends more or fewer commands) should update
+# benchmarks/baseline.json with --save in the same commit.
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Make sure the scripts open the emulator rather than a running daemon, and
+# keep the emulator's snapshots and memory model out of the real cache (and
+# every run starting from an empty one).
+os.environ['BC246T_SOCKET'] = os.path.join(tempfile.gettempdir(), 'bc246t-bench-nonexistent')
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='bc246t-bench-')
+
+import bc246t
+from bc246t.emulator import Emulator
+from bc246t.snapshot import SNAPSHOT_DIR
+
+# name: (systems, groups per system, channels per group)
+SIZES = {
+    'tiny': (1, 1, 10),
+    'small': (10, 2, 10),
+    'medium': (50, 4, 10),
+    'large': (200, 4, 5),
+}
+DEFAULT_SIZES = ('tiny', 'small', 'medium')
+
+STATUS_TICKS = 200
+
+
+def synthetic_library(systems, groups, channels):
+    """Returns an export.py document with the given number of records."""
+    data = {
+        'info': {'model': 'BC246T', 'firmware': 'Version 1.01.04'},
+        'settings': {
+            'backlight': '10',
+            'battery_save': False,
+            'key_beep': True,
+            'greeting': ['Benchmark', ''],
+            'priority_mode': 0,
+        },
+        'systems': [],
+    }
+
+    n = 0
+
+    for s in range(systems):
+        system = {'system_type': 'CNV', 'name': 'System %d' % s, 'groups': []}
+
+        for g in range(groups):
+            group = {'group_name': 'Group %d.%d' % (s, g), 'channels': []}
+
+            for c in range(channels):
+                group['channels'].append({
+                    'name': 'Channel %d' % n,
+                    'frequency': 1080000 + (n % 26000) * 25,
+                    'modulation': n % 2 and 'FM' or 'NFM',
+                })
+                n += 1
+
+            system['groups'].append(group)
+
+        data['systems'].append(system)
+
+    return data
+
+
+class Recorder:
+    """
+    Times every command sent through a bc246t.Interface opened while it is
+    active, pipelined or not, by adding a hook to each one and keeping the
+    elapsed time of every CommandEvent.
+    """
+
+    def __init__(self):
+        self.latencies = []
+
+    def __enter__(self):
+        original = self.original = bc246t.Interface.__init__
+        record = self.record
+
+        def __init__(interface, *args, **kwargs):
+            original(interface, *args, **kwargs)
+            interface.add_hook(record)
+
+        bc246t.Interface.__init__ = __init__
+        return self
+
+    def __exit__(self, *exc):
+        bc246t.Interface.__init__ = self.original
+
+    def record(self, event):
+        self.latencies.append(event.elapsed)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def measure(emulator, fn):
+    commands, bytes_in, bytes_out = emulator.commands, emulator.bytes_in, emulator.bytes_out
+
+    with Recorder() as recorder, contextlib.redirect_stdout(io.StringIO()):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        fn()
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+
+    commands = emulator.commands - commands
+
+    return {
+        'commands': commands,
+        'commands_per_sec': commands / wall,
+        'wire_bytes': emulator.bytes_in - bytes_in + emulator.bytes_out - bytes_out,
+        'wall_time': wall,
+        'cpu_time': cpu,
+        'latency_p50': percentile(recorder.latencies, .50),
+        'latency_p99': percentile(recorder.latencies, .99),
+    }
+
+
+def run(size, baudrate, turnaround=0.0):
+    data = synthetic_library(*SIZES[size])
+    records = sum(1 + sum(1 + len(g['channels']) for g in s['groups']) for s in data['systems'])
+
+    # Start every run from an empty cache, so that each one calibrates the
+    # memory model the same way.
+    shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+
+    emulator = Emulator(baudrate=baudrate or None, memory_blocks=max(3000, records * 2),
+        turnaround=turnaround)
+    os.environ['BC246T_PORT'] = emulator.start()
+
+    export = importlib.import_module('export')
+    import_ = importlib.import_module('import')
+    status = importlib.import_module('status')
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'library.json')
+        open(source, 'w').write(json.dumps(data))
+        open(os.path.join(tmp, '.i-know-what-im-doing'), 'w').close()
+
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            results['import'] = measure(emulator, lambda: import_.main(source))
+        finally:
+            os.chdir(cwd)
+
+    results['export'] = measure(emulator, lambda: export.main(cache=False))
+    results['status'] = measure(emulator, lambda: status.main(STATUS_TICKS, 0, 0))
+
+    return results
+
+
+def median(runs):
+    """Returns the results of several run()s, each number the median of the runs'."""
+    return {name: {k: statistics.median(r[name][k] for r in runs) for k in runs[0][name]}
+        for name in runs[0]}
+
+
+def report(results):
+    print('%-8s %-7s %8s %10s %10s %9s %9s %9s %9s' % ('size', 'scenario', 'commands',
+        'cmds/sec', 'wire bytes', 'wall s', 'cpu s', 'p50 ms', 'p99 ms'))
+
+    for size, scenarios in results.items():
+        for name, r in scenarios.items():
+            print('%-8s %-7s %8d %10.1f %10d %9.3f %9.3f %9.3f %9.3f' % (size, name,
+                r['commands'], r['commands_per_sec'], r['wire_bytes'], r['wall_time'],
+                r['cpu_time'], r['latency_p50'] * 1000, r['latency_p99'] * 1000))
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+
+    for size, scenarios in results.items():
+        for name, r in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+
+            if base is None:
+                continue
+
+            for k in ('wall_time', 'cpu_time', 'latency_p99'):
+                if base[k] > 0 and r[k] > base[k] * (1 + tolerance):
+                    regressions.append('%s/%s %s: %.4f -> %.4f (+%.0f%%)' % (size, name, k,
+                        base[k], r[k], (r[k] / base[k] - 1) * 100))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Throughput benchmarks for export.py, import.py and status.py.')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+        help='comma separated, from: %s' % ', '.join(SIZES))
+    parser.add_argument('--baudrate', type=int, default=57600,
+        help='wire speed to model, 0 for none')
+    parser.add_argument('--turnaround', type=float, default=0.0,
+        help='seconds each reply is held up on its way back')
+    parser.add_argument('--save', metavar='FILE', help='write results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a baseline')
+    parser.add_argument('--runs', type=int, default=3,
+        help='runs of each size to take the median of')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {}
+
+    for size in args.sizes.split(','):
+        results[size] = median([run(size, args.baudrate, args.turnaround)
+            for _ in range(args.runs)])
+
+    report(results)
+
+    if args.save:
+        open(args.save, 'w').write(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(results, json.loads(open(args.compare).read()), args.tolerance)
+
+        for r in regressions:
+            print('[!] regression: %s' % r)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,91 +7,149 @@ import json
 import sys
 
 from bc246t import SYSTEM_DEFAULTS, GROUP_DEFAULTS, CHANNEL_DEFAULTS
-from jsonschema import validate, ValidationError
+from bc246t import snapshot
+from bc246t.tree import read_settings, iter_tree
+from bc246t.validator import validate
 
-def main(include_defaults=False):
-    i = bc246t.Interface()
+def strip(system, include_defaults=False):
+    """Turn a system as read_tree() returns it into the export format."""
+    for group in system['groups']:
+        for channel in group['channels']:
+            if channel['attenuation'] == '':
+                channel['attenuation'] = '0'
 
-    i.enter_program_mode()
+            for _ in ['index', 'reverse_index', 'system_index', 'group_index']:
+                channel.pop(_)
 
-    sys_idx = i.get_system_index_head()
+            channel_keys = list(channel.keys())
+            for k in channel_keys:
+                if k in CHANNEL_DEFAULTS and channel[k] == CHANNEL_DEFAULTS[k] and not include_defaults:
+                    channel.pop(k)
 
-    data = {
-        'meta': {
-            'created_at': datetime.datetime.now().isoformat(),
-        },
-        'info': {
-            'model': i.get_model(),
-            'firmware': i.get_firmware_version(),
-        },
-        'settings': {
-            'backlight': i.get_backlight(),
-            'battery_save': i.get_battery_savings_mode(),
-            'key_beep': i.get_key_beep(),
-            'greeting': i.get_greeting(),
-            'priority_mode': i.get_priority_mode(),
-        },
-        'systems': [],
-    }
+            channel.pop('forward_index')
+
+        for _ in ['index', 'group_sequence', 'quick_key', 'reverse_index', 'system_index', 'channel_head_index', 'channel_tail_index']:
+            group.pop(_)
+
+        group_keys = list(group.keys())
+        for k in group_keys:
+            if k in GROUP_DEFAULTS and group[k] == GROUP_DEFAULTS[k] and not include_defaults:
+                group.pop(k)
+
+        group.pop('forward_index')
+
+    for _ in ['index', 'sequence_number', 'quick_key', 'reverse_index', 'group_head_index', 'group_tail_index']:
+        system.pop(_)
+
+    system_keys = list(system.keys())
+    for k in system_keys:
+        if k in SYSTEM_DEFAULTS and system[k] == SYSTEM_DEFAULTS[k] and not include_defaults:
+            system.pop(k)
+
+    system.pop('forward_index')
+
+    return system
 
-    while sys_idx:
-        system = i.get_system_info(sys_idx)
 
-        system['groups'] = []
-        group_idx = system['group_head_index']
+def dumps(value, compact=False, depth=0):
+    """
+    json.dumps() in the export's layout, for a value nested depth levels
+    into the document.
+    """
+    if compact:
+        return json.dumps(value, separators=(',', ':'))
 
-        while group_idx:
-            group = i.get_group_info(group_idx)
+    return json.dumps(value, indent=2).replace('\n', '\n' + '  ' * depth)
 
-            group['channels'] = []
-            channel_idx = group['channel_head_index']
 
-            while channel_idx:
-                channel = i.get_channel_info(channel_idx)
+def write_stream(out, data, systems, compact=False):
+    """
+    Write data with the given systems to out one system at a time, as soon
+    as each arrives, validating each on the way.  The result is the same as
+    writing the whole document at once.
+    """
+    validate(instance=data, schema=bc246t.schema)
+    system_schema = bc246t.schema['properties']['systems']['items']
+
+    head = dumps(dict(data, systems=[]), compact)
+    head = head[:head.rindex('[')]
+
+    out.write(head + '[')
+    out.flush()
+
+    n = 0
 
-                if channel['attenuation'] == '':
-                    channel['attenuation'] = '0'
+    for system in systems:
+        validate(instance=system, schema=system_schema)
 
-                for _ in ['reverse_index', 'system_index', 'group_index']:
-                    channel.pop(_)
+        if compact:
+            out.write((n and ',' or '') + dumps(system, True))
+        else:
+            out.write((n and ',' or '') + '\n    ' + dumps(system, depth=2))
 
-                channel_keys = list(channel.keys())
-                for k in channel_keys:
-                    if k in CHANNEL_DEFAULTS and channel[k] == CHANNEL_DEFAULTS[k] and not include_defaults:
-                        channel.pop(k)
+        out.flush()
+        n += 1
 
-                channel_idx = channel.pop('forward_index')
-                group['channels'].append(channel)
+    if compact:
+        out.write(']}\n')
+    else:
+        out.write((n and '\n  ' or '') + ']\n}\n')
+    out.flush()
 
-            for _ in ['group_sequence', 'quick_key', 'reverse_index', 'system_index', 'channel_head_index', 'channel_tail_index']:
-                group.pop(_)
 
-            group_keys = list(group.keys())
-            for k in group_keys:
-                if k in GROUP_DEFAULTS and group[k] == GROUP_DEFAULTS[k] and not include_defaults:
-                    group.pop(k)
+def main(include_defaults=False, cache=False, stream=False, compact=False):
+    i = bc246t.connect()
 
-            group_idx = group.pop('forward_index')
-            system['groups'].append(group)
+    i.enter_program_mode()
+
+    model = i.get_model()
+    firmware = i.get_firmware_version()
 
-        for _ in ['sequence_number', 'quick_key', 'reverse_index', 'group_head_index', 'group_tail_index']:
-            system.pop(_)
+    if cache:
+        path = snapshot.default_path(i, model, firmware)
+        tree = snapshot.CachedTree(i, snapshot.load(path), model, firmware,
+            from_tail=not stream, trust=True)
+    else:
+        tree = iter_tree(i, from_tail=not stream)
+
+    data = {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(),
+        },
+        'info': {
+            'model': model,
+            'firmware': firmware,
+        },
+        'settings': read_settings(i),
+    }
 
-        system_keys = list(system.keys())
-        for k in system_keys:
-            if k in SYSTEM_DEFAULTS and system[k] == SYSTEM_DEFAULTS[k] and not include_defaults:
-                system.pop(k)
+    systems = (strip(system, include_defaults) for system in tree)
 
-        sys_idx = system.pop('forward_index')
-        data['systems'].append(system)
+    if stream:
+        write_stream(sys.stdout, data, systems, compact)
+    else:
+        data['systems'] = list(systems)
+        validate(instance=data, schema=bc246t.schema)
 
     i.exit_program_mode()
 
-    validate(instance=data, schema=bc246t.schema)
+    if cache:
+        snapshot.save(path, tree.snapshot)
+
+        if tree.trusted:
+            print(f'[*] Memory unchanged; took {tree.trusted} records from the snapshot '
+                f'without reading them ({path})', file=sys.stderr)
+        else:
+            print(f'[*] Read {tree.read} records, checked {tree.checked} from the snapshot '
+                f'({tree.changed} changed) ({path})', file=sys.stderr)
 
-    print(json.dumps(data, indent=2))
+    if not stream:
+        print(dumps(data, compact))
 
 
 if __name__ == '__main__':
     include_defaults = '--include-defaults' in sys.argv[1:]
-    main(include_defaults)
+    cache = '--cache' in sys.argv[1:]
+    stream = '--stream' in sys.argv[1:]
+    compact = '--compact' in sys.argv[1:]
+    main(include_defaults, cache, stream, compact)
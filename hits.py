@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+import bc246t
+import datetime
+import sys
+import time
+
+from bc246t.events import EventStream
+from bc246t.hitlog import HitLog, HITLOG_DIR
+
+def record(log):
+    """Log every transmission the scanner stops on until interrupted."""
+    stream = EventStream(bc246t.connect())
+
+    try:
+        log.follow(stream.subscribe())
+    finally:
+        stream.close()
+        log.close()
+
+def show(log, days):
+    since = days is not None and time.time() - days * 86400 or None
+
+    for hit in log.scan(since=since):
+        frequency = hit.frequency and "%d.%04dMHz" % divmod(hit.frequency, 10000) or ""
+
+        print("%s %6.1fs %-16s %-16s %-8s %13s %3d" % (
+            datetime.datetime.fromtimestamp(hit.time).strftime("%Y-%m-%d %H:%M:%S"),
+            hit.duration, hit.system_name, hit.group_name, hit.tgid, frequency, hit.signal))
+
+if __name__ == "__main__":
+    flags = dict(a.partition("=")[::2] for a in sys.argv[1:])
+
+    try:
+        if len(flags) != len(sys.argv) - 1 or set(flags) - {"--list", "--days", "--keep", "--dir"} or \
+                "--days" in flags and "--list" not in flags:
+            raise ValueError
+
+        days = "--days" in flags and float(flags["--days"]) or None
+        keep = None
+        directory = flags.get("--dir") or HITLOG_DIR
+
+        if "--keep" in flags:
+            keep = int(flags["--keep"])
+
+            if keep < 1:
+                raise ValueError
+    except ValueError:
+        print("usage: %s [--list [--days=N]] [--keep=SEGMENTS] [--dir=DIRECTORY]" % sys.argv[0])
+        print("")
+        print("    --list      print the logged hits instead of logging new ones")
+        print("    --days      only those from the last N days")
+        print("    --keep      keep only the newest SEGMENTS segment files of 4MB each")
+        print("    --dir       where the log is kept (%s)" % HITLOG_DIR)
+        sys.exit(-1)
+
+    log = HitLog(directory, keep=keep)
+
+    try:
+        if "--list" in flags:
+            show(log, days)
+        else:
+            record(log)
+    except KeyboardInterrupt:
+        pass
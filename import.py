@@ -3,19 +3,68 @@
 
 import bc246t
 import datetime
+import itertools
 import json
 import os
 import sys
 
-from jsonschema import validate, ValidationError
+from bc246t import budget
+from bc246t.diff import Clones, plan_import
+from bc246t.journal import Journal, default_path, digest
+from bc246t.stream import iter_document, iter_document_ahead
+from bc246t.validator import validate
+
+def load_stream(source):
+    """
+    Start parsing source in the background and return its document with
+    'systems' replaced by an iterator that yields (and validates) each
+    system as it is parsed.  Everything other than the systems is read and
+    validated first.
+    """
+    items = iter_document_ahead(open(source))
+    data = {}
+    pending = []
+
+    for key, value in items:
+        if key == 'system':
+            pending.append(value)
+        else:
+            data[key] = value
+
+        if pending and 'info' in data and 'settings' in data:
+            break
 
-def main(source):
-    data = json.loads(open(source).read())
     validate(instance=data, schema=bc246t.schema)
+    system_schema = bc246t.schema['properties']['systems']['items']
 
-    print('[*] Data is valid.')
+    def systems():
+        for key, value in itertools.chain([('system', s) for s in pending], items):
+            if key != 'system':
+                validate(instance={key: value}, schema=bc246t.schema)
+                continue
 
-    i = bc246t.Interface()
+            validate(instance=value, schema=system_schema)
+            yield value
+
+    data['systems'] = systems()
+    return data
+
+
+def main(source, diff=False, dry_run=False, stream=False, resume=False):
+    if stream:
+        data = load_stream(source)
+
+        print('[*] Header is valid; systems will be checked as they are read.')
+
+        if diff or dry_run:
+            data['systems'] = list(data['systems'])
+    else:
+        data = json.loads(open(source).read())
+        validate(instance=data, schema=bc246t.schema)
+
+        print('[*] Data is valid.')
+
+    i = bc246t.connect()
 
     i.enter_program_mode()
     model = i.get_model()
@@ -27,7 +76,7 @@ def main(source):
         sys.exit(1)
 
     if firmware != data['info']['firmware']:
-        print(f'[?] Firmware Conflict!')
+        print('[?] Firmware Conflict!')
         print('')
         print(f"    Data firmware:     {data['info']['firmware']}")
         print(f"    Scanner firmware:  {firmware}")
@@ -39,10 +88,50 @@ def main(source):
             print('[!] Bailing!')
             sys.exit(1)
 
+    if diff or dry_run:
+        return patch(i, data, dry_run)
+
+    if resume:
+        journal = Journal.load(default_path(i))
+
+        if journal is None:
+            print('[!] There is no import to resume!')
+            sys.exit(1)
+
+        if journal.digest != digest(source):
+            print('[!] The import to resume was of a different file!')
+            sys.exit(1)
+
+        i.enter_program_mode()
+
+        if journal.settings:
+            print('[*] Checking scanner against the journal...')
+
+            try:
+                journal.check(i)
+            except ValueError as e:
+                print(f'[!] Cannot resume: {e}!')
+                i.exit_program_mode()
+                sys.exit(1)
+
+            systems, groups, channels = journal.counts()
+            print(f'[*] Resuming after {systems} systems, {groups} groups, and {channels} channels.')
+
+        journal.reopen()
+        return restore(i, data, journal)
+
+    # Check the data fits with what is already known about the scanner's
+    # memory; measuring it writes to the scanner, so that waits until the
+    # user has agreed to it being cleared.
+    memory = budget.load(i, model, firmware)
+
+    if memory is not None:
+        check_budget(source, data, stream, memory)
+
     skip_file = '.i-know-what-im-doing'
 
     if not os.path.exists(skip_file):
-        print(f'[?] Scanner will be reset to factory settings before being restored!')
+        print('[?] Scanner will be reset to factory settings before being restored!')
         print('')
 
         confirmation = input('    Type "YES" to continue: ')
@@ -57,24 +146,78 @@ def main(source):
 
     i.enter_program_mode()
 
-    print('[*] Resetting scanner to factory settings...')
-    i.clear_all_memory()
+    if memory is None:
+        memory = budget.memory_model(i, model, firmware)
 
-    print(f"[*] Setting backlight to {data['settings']['backlight']}")
-    i.set_backlight(data['settings']['backlight'])
+    check = None
 
-    print(f"[*] Setting battery save to {data['settings']['battery_save']}")
-    i.set_battery_savings_mode(data['settings']['battery_save'])
+    if memory is not None:
+        check_budget(source, data, stream, memory, i)
+    else:
+        # There's no room for the calibration probe, so measure once the
+        # scanner has been cleared, before any system is written.
+        print('[*] Scanner is too full to measure what records cost; measuring once it is cleared.')
 
-    print(f"[*] Setting key beep to {data['settings']['key_beep']}")
-    i.set_key_beep(data['settings']['key_beep'])
+        def check(memory):
+            if memory is None:
+                print('[!] Cannot measure what records cost on the cleared scanner!')
+                i.exit_program_mode()
+                sys.exit(1)
 
-    print(f"[*] Setting greeting to {data['settings']['greeting']}")
-    l1, l2 = data['settings']['greeting']
-    i.set_greeting(l1, l2)
+            check_budget(source, data, stream, memory, i)
+
+    journal = Journal(default_path(i))
+    journal.begin(digest(source))
+
+    restore(i, data, journal, check)
 
-    print(f"[*] Setting priority mode to {data['settings']['priority_mode']}")
-    i.set_priority_mode(data['settings']['priority_mode'])
+
+def check_budget(source, data, stream, memory, i=None):
+    """
+    Exit, listing the systems to leave out, if data won't fit in the
+    scanner's memory.  With stream, the whole file is parsed once more to
+    count its records.  If i is given, it is taken out of Program Mode
+    before exiting.
+    """
+    if stream:
+        systems = (v for k, v in iter_document(open(source)) if k == 'system')
+    else:
+        systems = data['systems']
+
+    b = budget.Budget(systems, memory)
+    capacity = f"{b.estimated and 'about ' or ''}{b.capacity}"
+
+    if not b.fits():
+        print(f'[!] Data needs about {b.needed} memory blocks but the scanner holds {capacity}!')
+        print('')
+        print('    Leaving out these systems would make it fit:')
+        print('')
+
+        for n, name, cost in b.trim():
+            print(f'        {name:20} {cost:.0f} blocks')
+
+        print('')
+
+        if i is not None:
+            i.exit_program_mode()
+
+        sys.exit(1)
+
+    print(f'[*] Data needs about {b.needed} of {capacity} memory blocks.')
+
+
+def restore(i, data, journal, check=None):
+    """
+    Clear the scanner and program it with data, recording each step in
+    journal and skipping whatever it says was already done.  If check is
+    given, it is called with the memory model once the scanner is cleared.
+
+    A system that is the same shape as one already created, and close enough
+    to it, is copied on the scanner and then patched; see Clones.
+    """
+    if not journal.settings:
+        clear(i, data, check)
+        journal.settings_done()
 
     print('[*] Creating systems:')
     print('')
@@ -82,62 +225,187 @@ def main(source):
     system_count = 0
     group_count = 0
     channel_count = 0
+    clones = Clones()
 
     for s in data['systems']:
         print(f"    [{s['name']}]")
         print('')
-        system_idx = i.create_system(s['system_type'])
         system_count += 1
+        position = (system_count - 1,)
 
         s['quick_key'] = system_count < 10 and system_count or None
         s['sequence_number'] = system_count
 
-        v = {}
-        for k in ['quick_key', 'hold_time', 'lockout', 'attenuation', 'delay_time', 'data_skip', 'emergency_alert']:
-            v[k] = s.get(k)
+        system_idx = journal.index(position)
+        clone = None
+
+        if system_idx is None or journal.is_clone(position):
+            clone = clones.find(s)
+
+        if system_idx is None:
+            if clone is not None:
+                system_idx = i.copy_system(clone.idx, s['name'])
+                journal.create(position, system_idx, clone=True)
+            else:
+                system_idx = i.create_system(s['system_type'])
+                journal.create(position, system_idx)
+
+        if not journal.is_set(position):
+            if journal.is_clone(position):
+                clone.apply(i, system_idx, s, system_count)
+            else:
+                v = {}
+                for k in ['quick_key', 'hold_time', 'lockout', 'attenuation', 'delay_time', 'data_skip', 'emergency_alert']:
+                    v[k] = s.get(k)
+
+                i.set_system_info(system_idx, s['name'], v)
 
-        i.set_system_info(system_idx, s['name'], v)
+            journal.set(position)
+
+        if journal.is_clone(position):
+            print(f"        Copied from [{clone.name}] in {clone.commands} commands")
+            print('')
+
+            group_count += len(s['groups'])
+            channel_count += sum(len(g['channels']) for g in s['groups'])
+            clones.add(s, system_idx)
+            continue
 
         system_group_count = 0
 
         for g in s['groups']:
             print(f"        {g['group_name']}:")
             print('')
-            group_idx = i.append_channel_group(system_idx)
             group_count += 1
             system_group_count += 1
+            position = (system_count - 1, system_group_count - 1)
 
             g['quick_key'] = system_group_count < 10 and system_group_count or None
             g['group_sequence'] = group_count
 
-            v = {}
-            for k in ['quick_key', 'lockout']:
-                v[k] = g.get(k)
+            group_idx = journal.index(position)
 
-            i.set_group_info(group_idx, g['group_name'], v)
+            if group_idx is None:
+                group_idx = i.append_channel_group(system_idx)
+                journal.create(position, group_idx)
 
-            for c in g['channels']:
-                print(f"            {c['name']:20} {c['frequency']/10000:.5f} {c['modulation']}")
-                channel_idx = i.append_channel(group_idx)
+            if not journal.is_set(position):
+                v = {}
+                for k in ['quick_key', 'lockout']:
+                    v[k] = g.get(k)
+
+                i.set_group_info(group_idx, g['group_name'], v)
+                journal.set(position)
+
+            for n, c in enumerate(g['channels']):
                 channel_count += 1
+                position = (system_count - 1, system_group_count - 1, n)
+
+                if journal.is_set(position):
+                    continue
+
+                print(f"            {c['name']:20} {c['frequency']/10000:.5f} {c['modulation']}")
+                channel_idx = journal.index(position)
+
+                if channel_idx is None:
+                    channel_idx = i.append_channel(group_idx)
+                    journal.create(position, channel_idx)
 
                 v = {}
                 for k in ['search_step', 'ctcss_dcs_mode', 'ctcss_dcs_tone_lockout', 'lockout', 'priority', 'attenuation', 'alert']:
                     v[k] = c.get(k)
 
                 i.set_channel_info(channel_idx, c['name'], c['frequency'], c['modulation'], v)
+                journal.set(position)
 
             print('')
 
+        clones.add(s, system_idx)
+
     i.push_key('S')
     i.exit_program_mode()
+    journal.close(True)
 
     print(f"[*] Created {system_count} systems, {group_count} groups, and {channel_count} channels!")
 
 
+def clear(i, data, check=None):
+    print('[*] Resetting scanner to factory settings...')
+    i.clear_all_memory()
+
+    model = i.get_model()
+    firmware = i.get_firmware_version()
+
+    if check is not None:
+        budget.memory_model(i, model, firmware)
+
+    budget.record_capacity(i, model, firmware)
+
+    if check is not None:
+        check(budget.load(i, model, firmware))
+
+    print(f"[*] Setting backlight to {data['settings']['backlight']}")
+    i.set_backlight(data['settings']['backlight'])
+
+    print(f"[*] Setting battery save to {data['settings']['battery_save']}")
+    i.set_battery_savings_mode(data['settings']['battery_save'])
+
+    print(f"[*] Setting key beep to {data['settings']['key_beep']}")
+    i.set_key_beep(data['settings']['key_beep'])
+
+    print(f"[*] Setting greeting to {data['settings']['greeting']}")
+    l1, l2 = data['settings']['greeting']
+    i.set_greeting(l1, l2)
+
+    print(f"[*] Setting priority mode to {data['settings']['priority_mode']}")
+    i.set_priority_mode(data['settings']['priority_mode'])
+
+
+def patch(i, data, dry_run=False):
+    i.enter_program_mode()
+
+    print('[*] Reading scanner...')
+    plan = plan_import(i, data)
+
+    print(f'[*] {len(plan.steps)} changes, {plan.commands} commands '
+        f'(reading the scanner took about {plan.read_commands}):')
+    print('')
+
+    for description, commands, _ in plan.steps:
+        print(f'    {description} ({commands})')
+
+    if plan.steps:
+        print('')
+
+    if dry_run:
+        i.exit_program_mode()
+        return
+
+    plan.apply(i)
+
+    i.push_key('S')
+    i.exit_program_mode()
+
+    print('[*] Scanner updated!')
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f'usage: {sys.argv[0]} <data_file>')
+    flags = [a for a in sys.argv[1:] if a.startswith('--')]
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+
+    if len(args) != 1 or set(flags) - {'--diff', '--dry-run', '--stream', '--resume'} or \
+            '--resume' in flags and ('--diff' in flags or '--dry-run' in flags):
+        print(f'usage: {sys.argv[0]} [--diff] [--dry-run] [--stream] [--resume] <data_file>')
+        print('')
+        print('    --diff      update the scanner in place instead of clearing it first')
+        print('    --dry-run   print what --diff would change and exit')
+        print('    --stream    start programming while the file is still being read; a')
+        print('                bad system part way through stops the import there.  The')
+        print('                file is still parsed once beforehand to check that it fits')
+        print("                in the scanner's memory")
+        print('    --resume    carry on with an import of the same file that was cut short,')
+        print('                instead of starting again')
         sys.exit(-1)
 
-    main(sys.argv[1])
+    main(args[0], '--diff' in flags, '--dry-run' in flags, '--stream' in flags,
+        '--resume' in flags)
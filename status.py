@@ -6,7 +6,39 @@ import time
 import signal
 import sys
 
-def main():
+from bc246t.poll import AdaptiveInterval, ProgramModeSampler, POLL_FLOOR, POLL_CEILING
+
+# Unchanged stretches shorter than this between two changes are rewritten
+# anyway; moving the cursor past them would take more bytes than they do.
+MIN_GAP = 6
+
+def redraw(old, new):
+    """
+    Returns what to write to turn the frame old, on the terminal with the
+    cursor at its top left, into new: each run of changed characters, got to
+    with cursor movement escapes.  The cursor is left where it started.
+    """
+    out = []
+
+    for row, (a, b) in enumerate(zip(old.split("\n"), new.split("\n"))):
+        width = max(len(a), len(b))
+        a, b = a.ljust(width), b.ljust(width)
+        changed = [col for col in range(width) if a[col] != b[col]]
+        runs = []
+
+        for col in changed:
+            if runs and col - runs[-1][1] <= MIN_GAP:
+                runs[-1][1] = col + 1
+            else:
+                runs.append([col, col + 1])
+
+        for start, end in runs:
+            out.append((row and "\033[%dB" % row or "") + "\033[%dG" % (start + 1) +
+                b[start:end] + (row and "\033[%dA" % row or ""))
+
+    return out and "".join(out) + "\r" or ""
+
+def main(ticks=None, floor=POLL_FLOOR, ceiling=POLL_CEILING):
     format = """Free: %s%%          Batt: %.4sV
   ╔════════════════════════╗
   ║    %s    ║
@@ -16,29 +48,40 @@ def main():
 %3.3s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s %3.3s %3.3s %5.5s %4.4s
 %3.3s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s%1.1s %2.2s %1.1s%2.2s %3.3s %1.1s %1.1s"""
 
-    i = bc246t.Interface()
-    used_memory = None
-    battery_voltage = None
-    countdown = 0
+    i = bc246t.connect()
+    previous = None
+    frame = None
+    poll = AdaptiveInterval(floor, ceiling)
+    sampler = ProgramModeSampler(i)
 
-    while True:
-        if countdown == 0:
-            i.enter_program_mode()
-            free_memory = 100 - i.get_used_memory()
-            battery_voltage = (3.3 * i.get_battery_voltage())/255
-            i.exit_program_mode()
+    while ticks is None or ticks > 0:
+        if ticks is not None:
+            ticks = ticks - 1
 
-            countdown = 1000
+        s = i.get_status()
+        interval = poll.update(s)
 
-        countdown = countdown - 1
+        sampler.update(s)
 
-        s = i.get_status()
+        free_memory, battery_voltage = "--", "--"
+        if sampler.sampled_at is not None:
+            free_memory = 100 - sampler.used_memory
+            battery_voltage = (3.3 * sampler.battery_voltage)/255
 
         av, freq = "", ""
         if not s["squelch"]:
             av, freq = i.get_window_voltage()
             freq = "%s.%sMhz" % (freq[0:-4].lstrip("0"), freq[-4:])
 
+        # Most ticks show exactly what the last one did.
+        current = (s, free_memory, battery_voltage, av, freq)
+
+        if current == previous:
+            time.sleep(interval)
+            continue
+
+        previous = current
+
         buf = format % (
             free_memory,
             battery_voltage,
@@ -83,8 +126,14 @@ def main():
             s["cc9_icon"]       == "0" and " "      or "©"
         )
 
-        print(buf + "\033[%dA" % (buf.count("\n") + 1))
-        time.sleep(.1)
+        if frame is None:
+            print(buf + "\033[%dA" % (buf.count("\n") + 1))
+        else:
+            sys.stdout.write(redraw(frame, buf))
+            sys.stdout.flush()
+
+        frame = buf
+        time.sleep(interval)
 
 def shutdown():
     # show cursor
@@ -96,6 +145,24 @@ def handle_sigint(sig, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
+    flags = dict(a.split("=", 1) for a in sys.argv[1:] if "=" in a)
+
+    try:
+        if len(flags) != len(sys.argv) - 1 or set(flags) - {"--floor", "--ceiling"}:
+            raise ValueError
+
+        floor = float(flags.get("--floor", POLL_FLOOR))
+        ceiling = float(flags.get("--ceiling", POLL_CEILING))
+
+        if ceiling < floor:
+            raise ValueError
+    except ValueError:
+        print("usage: %s [--floor=SECONDS] [--ceiling=SECONDS]" % sys.argv[0])
+        print("")
+        print("    --floor     time between polls while the scanner is active (%s)" % POLL_FLOOR)
+        print("    --ceiling   longest time between polls once it is idle (%s)" % POLL_CEILING)
+        sys.exit(-1)
+
     signal.signal(signal.SIGINT, handle_sigint)
 
     try:
@@ -103,6 +170,6 @@ if __name__ == "__main__":
         sys.stdout.write("\033[?25l")
         sys.stdout.flush()
 
-        main()
+        main(floor=floor, ceiling=ceiling)
     finally:
         shutdown()
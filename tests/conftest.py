@@ -0,0 +1,73 @@
+import importlib
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Keep snapshots, journals and memory models out of the real cache, and make
+# sure the scripts open the emulator rather than a running daemon.
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='bc246t-tests-')
+os.environ['BC246T_SOCKET'] = os.path.join(os.environ['XDG_CACHE_HOME'], 'nonexistent')
+
+import pytest
+
+import bc246t
+from bc246t.emulator import Emulator
+
+
+def library(systems=2, groups=2, channels=3):
+    """Returns an export.py document with the given number of records."""
+    data = {
+        'info': {'model': 'BC246T', 'firmware': 'Version 1.01.04'},
+        'settings': {
+            'backlight': '10',
+            'battery_save': False,
+            'key_beep': True,
+            'greeting': ['Tests', ''],
+            'priority_mode': 0,
+        },
+        'systems': [],
+    }
+
+    n = 0
+
+    for s in range(systems):
+        system = {'system_type': 'CNV', 'name': 'System %d' % s, 'groups': []}
+
+        for g in range(groups):
+            group = {'group_name': 'Group %d.%d' % (s, g), 'channels': []}
+
+            for c in range(channels):
+                group['channels'].append({
+                    'name': 'Channel %d' % n,
+                    'frequency': 1080000 + n * 25,
+                    'modulation': n % 2 and 'FM' or 'NFM',
+                })
+                n += 1
+
+            system['groups'].append(group)
+
+        data['systems'].append(system)
+
+    return data
+
+
+def script(name):
+    """Returns export.py, import.py or status.py as a module."""
+    return importlib.import_module(name)
+
+
+@pytest.fixture
+def emulator(monkeypatch):
+    """A fresh emulator that bc246t.connect() will open."""
+    e = Emulator()
+    monkeypatch.setenv('BC246T_PORT', e.start())
+    return e
+
+
+@pytest.fixture
+def scanner(emulator):
+    """An Interface to the emulator."""
+    return bc246t.Interface(emulator.port)
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import pty
+import tty
+
+import pytest
+import serial
+
+import bc246t
+from bc246t import UnidenError, UnidenFramingError, UnidenOverrunError, UnidenTimeoutError
+from bc246t.aio import AsyncInterface
+
+from conftest import library
+
+
+def test_mirrored_methods(emulator):
+    emulator.populate(library())
+
+    async def run():
+        async with AsyncInterface(emulator.port, timeout=2) as i:
+            await i.enter_program_mode()
+            head, tail = await i.get_system_index_head(), await i.get_system_index_tail()
+            infos = await i.get_system_infos([head, tail])
+            await i.exit_program_mode()
+
+            return await i.get_model(), [info['name'] for info in infos]
+
+    assert asyncio.run(run()) == ('BC246T', ['System 0', 'System 1'])
+
+
+def test_only_scanner_commands_are_mirrored():
+    for name in ('add_hook', 'remove_hook', 'priority'):
+        assert not hasattr(AsyncInterface, name)
+
+
+@pytest.fixture
+def line():
+    """A pty standing in for the scanner: (AsyncInterface's device, the far end's fd)."""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    device = serial.Serial(os.ttyname(slave), timeout=0)
+
+    yield device, master
+
+    device.close()
+    os.close(master)
+    os.close(slave)
+
+
+def reply_with(line, reply, timeout=.2):
+    """Send a command, answer it with reply, and return what it raises."""
+    device, master = line
+
+    async def run():
+        i = AsyncInterface(device=device, timeout=timeout)
+        asyncio.get_running_loop().call_later(.01, os.write, master, reply)
+
+        with pytest.raises(UnidenError) as e:
+            await i.get_model()
+
+        return e.type
+
+    return asyncio.run(run())
+
+
+def test_default_timeout(line):
+    assert AsyncInterface(device=line[0]).timeout == bc246t.DEFAULT_TIMEOUT
+
+
+@pytest.mark.parametrize('reply, error', [
+    (b'STS,0\r', UnidenFramingError),
+    (b'MDL,\xff\xfe\r', UnidenFramingError),
+    (b'MDL,' + b'x' * (bc246t.MAX_FRAME_LENGTH + 1), UnidenOverrunError),
+    (b'', UnidenTimeoutError),
+])
+def test_replies_are_checked_like_interface(line, reply, error):
+    assert reply_with(line, reply) is error
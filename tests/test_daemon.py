@@ -0,0 +1,132 @@
+import socket
+import threading
+import time
+
+import pytest
+import serial
+
+import bc246t
+from bc246t import daemon
+from bc246t.daemon import ClientInterface, Daemon
+from bc246t.poll import ProgramModeSampler
+
+from conftest import library
+
+
+@pytest.fixture
+def socket_path(emulator, tmp_path, monkeypatch):
+    """A Daemon serving the emulator, populated with a small library."""
+    monkeypatch.setattr(daemon, 'QUEUED_INTERVAL', .05)
+    emulator.populate(library())
+
+    path = str(tmp_path / 'daemon.sock')
+    server = Daemon(bc246t.Interface(emulator.port), path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield path
+
+    server.shutdown()
+    server.server_close()
+
+
+def background(fn):
+    result = {}
+
+    def run():
+        try:
+            result['value'] = fn()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+
+    return thread, result
+
+
+def test_program_mode_belongs_to_one_client(emulator, socket_path):
+    export = ClientInterface(socket_path)
+    status = ClientInterface(socket_path)
+
+    export.enter_program_mode()
+    head = export.get_system_index_head()
+
+    sampler = ProgramModeSampler(status)
+    thread, result = background(sampler.sample)
+
+    # The sampler's PRG and EPG wait; the export stays in Program Mode.
+    for _ in range(10):
+        export.get_system_info(head)
+        time.sleep(.02)
+
+    assert thread.is_alive()
+    assert emulator.program_mode
+
+    export.exit_program_mode()
+    thread.join(5)
+
+    assert 'error' not in result
+    assert sampler.used_memory is not None
+    assert not emulator.program_mode
+
+
+def test_nested_program_mode(emulator, socket_path):
+    i = ClientInterface(socket_path)
+
+    i.enter_program_mode()
+    i.enter_program_mode()
+    i.exit_program_mode()
+
+    assert emulator.program_mode
+    i.get_system_index_head()
+
+    i.exit_program_mode()
+
+    assert not emulator.program_mode
+
+
+def test_queued_command_does_not_time_out(emulator, socket_path):
+    export = ClientInterface(socket_path)
+    status = ClientInterface(socket_path, timeout=.3)
+
+    export.enter_program_mode()
+    thread, result = background(status.get_status)
+
+    time.sleep(1)
+    assert thread.is_alive()
+
+    export.exit_program_mode()
+    thread.join(5)
+
+    assert 'error' not in result
+    assert result['value']['line1'] == emulator.line1
+
+
+def test_disconnect_gives_up_program_mode(emulator, socket_path):
+    export = ClientInterface(socket_path)
+    status = ClientInterface(socket_path)
+
+    export.enter_program_mode()
+    thread, result = background(status.get_status)
+
+    export.device.close()
+    thread.join(5)
+
+    assert 'error' not in result
+    assert not emulator.program_mode
+
+
+def test_closed_connection_raises(tmp_path):
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(tmp_path / 'closing.sock'))
+    listener.listen(1)
+
+    device = daemon._SocketDevice(str(tmp_path / 'closing.sock'))
+    listener.accept()[0].close()
+
+    try:
+        with pytest.raises(serial.SerialException):
+            device.read()
+    finally:
+        device.close()
+        listener.close()
@@ -0,0 +1,85 @@
+import json
+
+from conftest import library, script
+
+
+def export(capsys, cache=False):
+    script('export').main(cache=cache)
+    out, err = capsys.readouterr()
+
+    return json.loads(out), err
+
+
+def test_export_matches_scanner(emulator, capsys):
+    emulator.populate(library())
+    data, _ = export(capsys)
+
+    assert [s['name'] for s in data['systems']] == ['System 0', 'System 1']
+    assert [c['name'] for c in data['systems'][1]['groups'][1]['channels']] == \
+        ['Channel 9', 'Channel 10', 'Channel 11']
+
+
+def edit_in_place(scanner):
+    """Rename the first system and change its first channel, as from the keypad."""
+    scanner.enter_program_mode()
+    system = scanner.get_system_index_head()
+    group = scanner.get_system_info(system)['group_head_index']
+    channel = scanner.get_group_info(group)['channel_head_index']
+
+    scanner.set_system_info(system, 'NEWSYSNAME')
+    scanner.set_channel_info(channel, 'RENAMED', 1550000, 'FM')
+    scanner.exit_program_mode()
+
+
+def test_cached_export_trusts_the_fingerprint(emulator, scanner, capsys):
+    emulator.populate(library())
+    first, _ = export(capsys, cache=True)
+
+    commands = emulator.commands
+    second, err = export(capsys, cache=True)
+
+    assert second['systems'] == first['systems']
+    assert 'took 18 records from the snapshot without reading them' in err
+    assert emulator.commands - commands < 18
+
+    # The documented caveat: edits in place don't change the fingerprint.
+    edit_in_place(scanner)
+
+    assert export(capsys, cache=True)[0]['systems'] == first['systems']
+    assert export(capsys)[0]['systems'][0]['name'] == 'NEWSYSNAME'
+
+
+def test_cached_export_sees_edits_in_place_once_memory_changes(emulator, scanner, capsys):
+    emulator.populate(library())
+    first, _ = export(capsys, cache=True)
+
+    edit_in_place(scanner)
+
+    scanner.enter_program_mode()
+    group = scanner.get_system_info(scanner.get_system_index_tail())['group_tail_index']
+    scanner.set_channel_info(scanner.append_channel(group), 'ADDED', 1600000, 'NFM')
+    scanner.exit_program_mode()
+
+    second, err = export(capsys, cache=True)
+
+    assert second['systems'][0]['name'] == 'NEWSYSNAME'
+    assert second['systems'][0]['groups'][0]['channels'][0]['name'] == 'RENAMED'
+    assert second['systems'][0]['groups'][0]['channels'][0]['frequency'] == 1550000
+    assert second['systems'] == export(capsys)[0]['systems']
+    assert '(1 changed)' in err
+
+
+def test_cached_export_sees_added_channel(emulator, scanner, capsys):
+    emulator.populate(library())
+    export(capsys, cache=True)
+
+    scanner.enter_program_mode()
+    group = scanner.get_system_info(scanner.get_system_index_tail())['group_tail_index']
+    channel = scanner.append_channel(group)
+    scanner.set_channel_info(channel, 'ADDED', 1600000, 'NFM')
+    scanner.exit_program_mode()
+
+    data, _ = export(capsys, cache=True)
+
+    assert data['systems'] == export(capsys)[0]['systems']
+    assert data['systems'][1]['groups'][1]['channels'][-1]['name'] == 'ADDED'
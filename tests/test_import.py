@@ -0,0 +1,147 @@
+import copy
+import json
+import os
+
+import pytest
+
+import bc246t
+from bc246t import budget
+from bc246t.diff import plan_import
+
+from conftest import library, script
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """Writes a document to import and returns its path."""
+    monkeypatch.chdir(tmp_path)
+    open('.i-know-what-im-doing', 'w').close()
+
+    def write(data):
+        path = str(tmp_path / 'library.json')
+        open(path, 'w').write(json.dumps(data))
+        return path
+
+    return write
+
+
+def export(capsys):
+    capsys.readouterr()
+    script('export').main(cache=False)
+
+    return json.loads(capsys.readouterr().out)
+
+
+def interrupt_after(monkeypatch, n):
+    """Make the n+1'th set_channel_info() die, as if the import were killed."""
+    original = bc246t.Interface.set_channel_info
+    calls = []
+
+    def set_channel_info(self, *args, **kwargs):
+        calls.append(args)
+
+        if len(calls) > n:
+            raise KeyboardInterrupt
+
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(bc246t.Interface, 'set_channel_info', set_channel_info)
+
+
+def test_import_round_trip(emulator, source, capsys):
+    data = library()
+    script('import').main(source(data))
+
+    assert export(capsys)['systems'] == data['systems']
+
+
+def test_resume(emulator, source, capsys, monkeypatch):
+    data = library()
+    path = source(data)
+
+    with monkeypatch.context() as m:
+        interrupt_after(m, 7)
+
+        with pytest.raises(KeyboardInterrupt):
+            script('import').main(path)
+
+    script('import').main(path, resume=True)
+
+    assert 'Resuming after 2 systems' in capsys.readouterr().out
+    assert export(capsys)['systems'] == data['systems']
+
+
+def test_resume_after_clear(emulator, scanner, source, capsys, monkeypatch):
+    path = source(library())
+
+    with monkeypatch.context() as m:
+        interrupt_after(m, 7)
+
+        with pytest.raises(KeyboardInterrupt):
+            script('import').main(path)
+
+    scanner.enter_program_mode()
+    scanner.clear_all_memory()
+    scanner.exit_program_mode()
+
+    with pytest.raises(SystemExit):
+        script('import').main(path, resume=True)
+
+    assert '[!] Cannot resume' in capsys.readouterr().out
+
+def test_diff_import_is_idempotent(emulator, scanner, source, capsys):
+    data = library()
+    emulator.populate(data)
+
+    edited = copy.deepcopy(data)
+    edited['systems'][0]['name'] = 'Renamed'
+    edited['systems'][1]['groups'][0]['channels'][1]['frequency'] = 1550000
+    del edited['systems'][1]['groups'][1]['channels'][0]
+    edited['systems'][0]['groups'].append({'group_name': 'Added', 'channels': [
+        {'name': 'New', 'frequency': 1600000, 'modulation': 'FM'}]})
+
+    path = source(edited)
+    script('import').main(path, diff=True)
+
+    assert export(capsys)['systems'] == edited['systems']
+
+    scanner.enter_program_mode()
+    assert plan_import(scanner, edited).steps == []
+    scanner.exit_program_mode()
+
+
+def near_duplicates():
+    """A library whose systems differ from the first by a group each."""
+    data = library(systems=4, groups=3, channels=4)
+
+    for n, system in enumerate(data['systems'][1:]):
+        system['groups'] = copy.deepcopy(data['systems'][0]['groups'])
+        system['groups'][n]['channels'][1]['name'] = 'Changed %d' % n
+        system['groups'][n]['group_name'] = 'Group %d' % n
+
+    return data
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_clone_round_trip(emulator, source, capsys, stream):
+    data = near_duplicates()
+    script('import').main(source(data), stream=stream)
+
+    assert capsys.readouterr().out.count('Copied from [System 0]') == 3
+    assert export(capsys)['systems'] == data['systems']
+
+
+def test_budget_is_checked_when_too_full_to_measure(emulator, source, capsys):
+    # 95 of 100 blocks used leaves no room for the calibration probe.
+    emulator.memory_blocks = 100
+    emulator.used_blocks = 95
+
+    if os.path.exists(budget.MODEL_PATH):
+        os.remove(budget.MODEL_PATH)
+
+    with pytest.raises(SystemExit):
+        script('import').main(source(library(systems=5, groups=3, channels=8)))
+
+    assert '[!] Data needs about 145 memory blocks but the scanner holds 100!' in capsys.readouterr().out
+    assert emulator.system_list == []
+    assert not emulator.program_mode
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import bc246t
+from bc246t import UnidenAbortedError, UnidenTimeoutError
+
+
+class SlowDevice:
+    """
+    A device that answers CIN,n with channel n, in order, each reply taking
+    delay seconds--or, for the indices in slow, late seconds.
+    """
+    def __init__(self, delay=.001, late=.3, slow=()):
+        self.delay = delay
+        self.late = late
+        self.slow = set(slow)
+        self.lock = threading.Lock()
+        self.replies = []
+        self.ready_at = 0
+        self.port = 'slow'
+
+    def __reply(self, line):
+        cmd, idx = line.split(',')
+        return ('CIN,Channel %s,01080000,0,FM,0,0,0,0,0,0,-1,-1,1,2\r' % idx).encode()
+
+    def write(self, data):
+        with self.lock:
+            for line in data.decode().split('\r')[:-1]:
+                idx = int(line.split(',')[1])
+                delay = idx in self.slow and self.late or self.delay
+
+                # Replies come back in order, like the scanner's.
+                self.ready_at = max(self.ready_at, time.monotonic()) + delay
+                self.replies.append((self.ready_at, self.__reply(line)))
+                self.slow.discard(idx)
+
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            now = time.monotonic()
+            return sum(len(r) for t, r in self.replies if t <= now)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + bc246t.READ_POLL_INTERVAL
+
+        while time.monotonic() < deadline:
+            with self.lock:
+                now = time.monotonic()
+                out = b''
+
+                while self.replies and self.replies[0][0] <= now and len(out) < size:
+                    out += self.replies.pop(0)[1]
+
+            if out:
+                return out
+
+            time.sleep(.005)
+
+        return b''
+
+    def close(self):
+        pass
+
+
+def names(results):
+    return [isinstance(r, list) and r[1] or r.__class__ for r in results]
+
+
+def test_late_reply_is_not_taken_for_the_retry():
+    i = bc246t.Interface(device=SlowDevice(slow=[1]), timeout=.2, backoff=.01)
+
+    assert i.get_channel_info(1)['name'] == 'Channel 1'
+    assert i.get_channel_info(2)['name'] == 'Channel 2'
+    assert i.get_channel_info(3)['name'] == 'Channel 3'
+
+
+def test_late_reply_fails_the_rest_of_a_pipeline():
+    i = bc246t.Interface(device=SlowDevice(slow=[1]), timeout=.2)
+
+    results = i.pipeline([('CIN', n) for n in range(12)])
+
+    assert names(results) == ['Channel 0', UnidenTimeoutError] + [UnidenAbortedError] * 10
+    assert names(i.pipeline([('CIN', n) for n in range(4)])) == \
+        ['Channel 0', 'Channel 1', 'Channel 2', 'Channel 3']
+    assert i.get_channel_info(5)['name'] == 'Channel 5'
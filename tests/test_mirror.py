@@ -0,0 +1,71 @@
+import random
+
+from bc246t.mirror import MirroredInterface
+
+from conftest import library
+
+
+def records(i):
+    """Every system, group and channel on the scanner, read through i."""
+    systems, groups, channels = [], [], []
+    idx = i.get_system_index_head()
+
+    while idx not in (None, -1):
+        system = i.get_system_info(idx)
+        systems.append((idx, system))
+        g = system['group_head_index']
+
+        while g not in (None, -1):
+            group = i.get_group_info(g)
+            groups.append((g, group))
+            c = group['channel_head_index']
+
+            while c not in (None, -1):
+                channel = i.get_channel_info(c)
+                channels.append((c, channel))
+                c = channel['forward_index']
+
+            g = group['forward_index']
+
+        idx = system['forward_index']
+
+    return systems, groups, channels
+
+
+def test_mirror_matches_scanner(emulator, scanner):
+    emulator.populate(library())
+    rng = random.Random(1)
+
+    mirror = MirroredInterface(emulator.port)
+    mirror.enter_program_mode()
+    scanner.enter_program_mode()
+
+    for n in range(300):
+        systems, groups, channels = records(mirror)
+        op = rng.randrange(6)
+
+        if op == 0 or not systems:
+            idx = mirror.create_system('CNV')
+            mirror.set_system_info(idx, 'New %d' % n)
+        elif op == 1:
+            mirror.append_channel_group(rng.choice(systems)[0])
+        elif op == 2 and groups:
+            idx = mirror.append_channel(rng.choice(groups)[0])
+            mirror.set_channel_info(idx, 'Added %d' % n, 1080000 + n, 'FM')
+        elif op == 3 and channels:
+            mirror.set_channel_info(rng.choice(channels)[0], 'Edit %d' % n, 1090000 + n, 'NFM')
+        elif op == 4 and channels:
+            mirror.delete_channel(rng.choice(channels)[0])
+        elif op == 5 and len(systems) > 1:
+            mirror.delete_system(rng.choice(systems)[0])
+
+        if n % 25 == 0:
+            assert records(mirror) == records(scanner)
+
+    assert records(mirror) == records(scanner)
+
+
+def test_arguments_reach_interface(emulator):
+    i = MirroredInterface(emulator.port, timeout=.5, retries=4, backoff=.02)
+
+    assert (i.timeout, i.retries, i.backoff) == (.5, 4, .02)
@@ -0,0 +1,42 @@
+import pytest
+
+from bc246t import UnidenTimeoutError, UnidenUnexpectedResponseError
+from bc246t.poll import ProgramModeSampler
+
+
+def drop_epg(scanner, monkeypatch):
+    """Make pipelines lose their EPG, as if it timed out."""
+    pipeline = scanner.pipeline
+
+    def lossy(commands, *args):
+        commands = list(commands)
+        return pipeline(commands[:-1], *args) + [UnidenTimeoutError()]
+
+    monkeypatch.setattr(scanner, 'pipeline', lossy)
+
+
+def test_sampler_reads_in_program_mode(emulator, scanner):
+    sampler = ProgramModeSampler(scanner)
+    sampler.sample()
+
+    assert sampler.used_memory == 0
+    assert sampler.battery_voltage == emulator.battery
+    assert not emulator.program_mode
+
+
+def test_sampler_leaves_program_mode_after_lost_epg(emulator, scanner, monkeypatch):
+    drop_epg(scanner, monkeypatch)
+
+    sampler = ProgramModeSampler(scanner)
+    sampler.sample()
+
+    assert sampler.used_memory is not None
+    assert not emulator.program_mode
+
+
+def test_sampler_raises_if_it_cannot_leave_program_mode(emulator, scanner, monkeypatch):
+    drop_epg(scanner, monkeypatch)
+    monkeypatch.setattr(scanner, 'exit_program_mode', lambda: False)
+
+    with pytest.raises(UnidenUnexpectedResponseError):
+        ProgramModeSampler(scanner).sample()
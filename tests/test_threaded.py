@@ -0,0 +1,32 @@
+from bc246t import ThreadedInterface
+
+from test_interface import SlowDevice
+
+
+def test_arguments_reach_interface():
+    i = ThreadedInterface(device=SlowDevice(), timeout=.5, retries=4, backoff=.02)
+
+    try:
+        assert (i.timeout, i.retries, i.backoff) == (.5, 4, .02)
+    finally:
+        i.close()
+
+
+def test_submit_retries_like_send():
+    i = ThreadedInterface(device=SlowDevice(slow=[1]), timeout=.2, backoff=.01)
+
+    try:
+        assert i.submit('CIN', 1).result()[1] == 'Channel 1'
+        assert i.submit('CIN', 2).result()[1] == 'Channel 2'
+        assert i.get_channel_info(3)['name'] == 'Channel 3'
+    finally:
+        i.close()
+
+
+def test_submit(emulator):
+    i = ThreadedInterface(emulator.port)
+
+    try:
+        assert i.submit('MDL').result() == ['MDL', 'BC246T']
+    finally:
+        i.close()
@@ -0,0 +1,45 @@
+import copy
+
+import jsonschema
+import pytest
+
+import bc246t
+from bc246t.validator import validate
+
+from conftest import library
+
+
+def mutations():
+    data = library()
+    yield data
+
+    for path, value in [
+        (('systems', 0, 'groups', 0, 'channels', 0, 'frequency'), 1),
+        (('systems', 0, 'groups', 0, 'channels', 0, 'frequency'), True),
+        (('systems', 0, 'groups', 0, 'channels', 0, 'frequency'), 1080000.0),
+        (('systems', 0, 'groups', 0, 'channels', 0, 'modulation'), 'XX'),
+        (('systems', 1, 'name'), 7),
+        (('settings', 'greeting'), ['only one']),
+    ]:
+        mutated = copy.deepcopy(data)
+        parent = mutated
+
+        for key in path[:-1]:
+            parent = parent[key]
+
+        parent[path[-1]] = value
+        yield mutated
+
+
+@pytest.mark.parametrize('data', list(mutations()))
+def test_validate_agrees_with_jsonschema(data):
+    try:
+        jsonschema.validate(instance=data, schema=bc246t.schema)
+    except jsonschema.ValidationError as e:
+        with pytest.raises(jsonschema.ValidationError) as raised:
+            validate(instance=data, schema=bc246t.schema)
+
+        assert raised.value.json_path == e.json_path
+        assert raised.value.message == e.message
+    else:
+        validate(instance=data, schema=bc246t.schema)